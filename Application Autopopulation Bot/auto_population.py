@@ -1,10 +1,20 @@
 import streamlit as st
 # from langchain_community.chat_models import ChatOllama
-from fpdf import FPDF
-import subprocess
+from pdf_export import pdf_cache
+from profiling import GenerationProfiler
+import nli_loader
+import json
+import os
 import sys
 import time
 
+# Shared helpers (mentor_common/) live in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mentor_common import get_capabilities, ensure_nltk_data
+
+REQUIRED_MODELS = ("llama3.1",)
+NLTK_RESOURCES = ("tokenizers/punkt_tab",)
+
 # List of predefined questions that the AI will answer
 questions = [
     # Business Details
@@ -23,9 +33,6 @@ questions = [
 ]
 
 def main():
-    # Ensure GPU is available before continuing
-    gpu_check()
-
     st.title("Seed Grant Application Assistant")
 
     # Initialize session state to persist data across Streamlit reruns
@@ -41,9 +48,14 @@ def main():
         st.session_state.show_confirmation = False
     if 'success_message' not in st.session_state:
         st.session_state.success_message = ""
+    if 'generation_profile' not in st.session_state:
+        st.session_state.generation_profile = None
 
     # Sidebar navigation
     st.sidebar.image("charlotte_logo.png", width=120)
+    capabilities = show_capabilities()
+    # Only block generation on a confirmed problem (Ollama down or the model missing)
+    can_generate = capabilities.ollama_reachable is not False and not capabilities.missing_models
     st.sidebar.title("Navigation")
     
     options = ["Enter Company Description", "View/Edit Answers"]
@@ -60,6 +72,12 @@ def main():
         key="sidebar_radio"
     )
 
+    # Admin tools: profile the next generation run and inspect/export the last profile
+    with st.sidebar.expander("Admin"):
+        st.checkbox("Profile answer generation", key="profile_generation", disabled=st.session_state.generating_answers)
+        show_generation_profile(st.session_state.generation_profile)
+        show_nli_memory()
+
     # Page 1: Text area to enter the company description
     if st.session_state.selected_sidebar_button == "Enter Company Description":
         company_description = st.text_area(
@@ -74,7 +92,7 @@ def main():
             st.session_state.company_description = company_description
 
         # Trigger generation or confirmation modal
-        if st.button("Generate Answers", disabled=st.session_state.generating_answers):
+        if st.button("Generate Answers", disabled=st.session_state.generating_answers or not can_generate):
             if any(st.session_state.answers):  # If answers already exist, ask for confirmation
                 st.session_state.show_confirmation = True
                 st.rerun()
@@ -121,8 +139,15 @@ def main():
 
     # AI generation logic triggered
     if st.session_state.generating_answers:
-        with st.spinner("Generating answers... This may take up to a few minutes."):
-            st.session_state.answers = generate_answers(st.session_state.company_description, questions)
+        profiler = GenerationProfiler(enabled=st.session_state.get("profile_generation", False))
+        device = nli_device()
+        expected = "a few minutes" if device != -1 else "several minutes without a GPU"
+        with st.spinner(f"Generating answers... This may take up to {expected}."):
+            st.session_state.answers = generate_answers(
+                st.session_state.company_description, questions, profiler, device=device
+            )
+        if profiler.enabled:
+            st.session_state.generation_profile = profiler.summary()
         st.session_state.generating_answers = False
         st.session_state.success_message = "Answers generated successfully!"
         st.rerun()
@@ -132,63 +157,79 @@ def main():
         st.success(st.session_state.success_message)
         st.session_state.success_message = ""
 
-# Verifies if GPU is available using nvidia-smi
-def gpu_check():
-    if 'gpu_message_shown' not in st.session_state:
-        st.session_state.gpu_message_shown = False
-
-    if not st.session_state.gpu_message_shown:
-        try:
-            output = subprocess.check_output('nvidia-smi', shell=True).decode('utf-8')
-            if "No devices were found" in output:
-                st.error("No GPU detected. Exiting.")
-                sys.exit(1)
-            elif "%" in output:
-                st.session_state.gpu_message_shown = True
-                success_placeholder = st.empty()
-                success_placeholder.success("GPU check passed.", icon="✅")
-                time.sleep(1)
-                success_placeholder.empty()
-            else:
-                st.warning("GPU is detected but not being used. Exiting.")
-                sys.exit(1)
-        except subprocess.CalledProcessError:
-            st.error("Unable to check GPU status. Exiting.")
-            sys.exit(1)
+# Summary of the last profiled generation run, with the full profile as a JSON download
+def show_generation_profile(profile):
+    if not profile:
+        st.caption("No profiled run yet.")
+        return
+
+    totals = profile["totals"]
+    st.write(f"**Last run:** {profile['total_seconds']:.1f}s for {totals['questions']} questions")
+    st.write("**Time by stage (s):**")
+    st.table({"stage": list(profile["stages"]), "seconds": list(profile["stages"].values())})
+    st.write(
+        f"LLM calls: {totals['llm_calls']} ({totals['input_tokens']} tokens in, {totals['output_tokens']} out)  \n"
+        f"NLI calls: {totals['nli_calls']}  \n"
+        f"Hallucination retries: {totals['retries']}, fallbacks: {totals['fallbacks']}"
+    )
+    st.write("**Slowest questions:**")
+    st.table(profile["slowest_questions"])
+    st.download_button(
+        label="Download profile (JSON)",
+        data=json.dumps(profile, indent=2),
+        file_name="generation_profile.json",
+        mime="application/json",
+    )
 
-# Generate a PDF with the final answers
+# How this process loaded the NLI model and how much of its memory is shared with other workers
+def show_nli_memory():
+    info = nli_loader.load_info()
+    if not info:
+        st.caption("NLI model not loaded yet.")
+        return
+    st.write(f"**NLI model:** {info['mode']} weights, loaded in {info['seconds']:.1f}s")
+    if info["error"]:
+        st.caption(f"Memory-mapped loading failed: {info['error']}")
+    report = nli_loader.memory_report(info["path"])
+    if report:
+        lines = [f"Resident: {report['rss_mb']} MB (proportional: {report['pss_mb']} MB)",
+                 f"Shared: {report['shared_mb']} MB, private: {report['private_mb']} MB"]
+        if "weights_rss_mb" in report:
+            lines.append(f"Weights resident: {report['weights_rss_mb']} MB, shared: {report['weights_shared_mb']} MB")
+        st.write("  \n".join(lines))
+
+# Shows the result of the shared capability probe (GPU, Ollama, models, NLTK data). The probe
+# runs once per process in the background, so this never delays the page; before the first
+# probe finishes the app assumes everything is available.
+def show_capabilities():
+    capabilities = get_capabilities(REQUIRED_MODELS, NLTK_RESOURCES)
+    if not capabilities.ready:
+        st.sidebar.caption("Checking GPU and Ollama...")
+        return capabilities
+
+    if capabilities.gpu:
+        st.sidebar.caption(f"✅ GPU mode ({capabilities.gpu_name})")
+    else:
+        st.sidebar.warning("No GPU detected: running in CPU mode, so generation will be slower.")
+        for note in capabilities.accelerator_notes:
+            st.sidebar.caption(note)
+    for problem in capabilities.problems:
+        st.sidebar.error(problem)
+    return capabilities
+
+# Generate a PDF with the final answers (cached per answer set, see pdf_export.py)
 def create_pdf(questions, answers):
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", size=12)
-    
-    # Add title
-    pdf.set_font("Arial", 'B', 16)
-    pdf.cell(200, 10, txt="Seed Grant Application", ln=True, align='C')
-    pdf.ln(10)
-    
-    # List each question and answer pair
-    pdf.set_font("Arial", size=12)
-    for question, answer in zip(questions, answers):
-        pdf.set_font("Arial", 'B', 12)
-        pdf.multi_cell(0, 10, txt=question)
-        pdf.set_font("Arial", size=12)
-        pdf.multi_cell(0, 10, txt=answer)
-        pdf.ln(5)
-    
-    return pdf.output(dest='S').encode('latin-1')
+    return pdf_cache.get(questions, answers)
 
 
 # AI model and hallucination validation setup
-from langchain_community.chat_models import ChatOllama
-from transformers import pipeline
-import torch
-import nltk
+from mentor_common.llm_pool import PooledChatOllama
+import torch  # Imported up front so the capability probe can also detect Apple (MPS) GPUs
 from nltk.tokenize import sent_tokenize, word_tokenize
 # from langchain.vectorstores import Chroma
 # from langchain.embeddings import HuggingFaceEmbeddings
 
-nltk.download('punkt_tab')  # Tokenizer used for splitting text
+ensure_nltk_data(*NLTK_RESOURCES)  # Tokenizer used for splitting text; only downloaded if missing
 
 # Splits text into manageable token-sized chunks
 def chunk_text(text, max_tokens=80, overlap=8):
@@ -226,12 +267,14 @@ def chunk_text(text, max_tokens=80, overlap=8):
     return chunks
 
 # Uses NLI model to check if chunk is grounded in the description
-def check_hallucination(nli_model, chunk, description):
+def check_hallucination(nli_model, chunk, description, profiler=None):
+    if profiler:
+        profiler.record_nli_call()
     result = nli_model(chunk, [description], hypothesis_template="This text is true: {}")
     return result['scores'][0] < 0.81  # Low score indicates a possible hallucination
 
 # Rewrite answer using LLM if hallucinated chunks were found
-def regenerate_answer(llm, chunks, description, question, answer):
+def regenerate_answer(llm, chunks, description, question, answer, profiler=None):
     prompt = f"""
     Company Description: ""{description}""
 
@@ -253,20 +296,46 @@ def regenerate_answer(llm, chunks, description, question, answer):
     - Be descriptive and provide concrete detail, but only if it's supported by the company description.
     - VERY IMPORTANT: Be sure to rewrite or omit the chunks marked as hallucinations! For rewritten chunks, ensure that the answer is firmly grounded in the company description.
     """
-    return llm.invoke(prompt).content
-
-# Main logic to generate and validate answers
-def generate_answers(description, questions):
-    llm = ChatOllama(model="llama3.1", device="cuda", temperature=0)
-    nli_model = pipeline("zero-shot-classification", model="facebook/bart-large-mnli", device=0 if torch.cuda.is_available() else -1)
+    return timed_invoke(llm, prompt, profiler or GenerationProfiler(enabled=False), "regenerate").content
+
+# Invokes the LLM, recording its time and tokens in the profiler
+def timed_invoke(llm, prompt, profiler, kind):
+    start = time.perf_counter()
+    with profiler.stage("llm"):
+        message = llm.invoke(prompt)
+    profiler.record_llm_call(kind, message, time.perf_counter() - start)
+    return message
+
+# Device for the NLI pipeline, asked of torch itself rather than the capability probe:
+# nvidia-smi can see a GPU this torch build can't use (CPU-only wheel, older driver)
+def nli_device():
+    if torch.cuda.is_available():
+        return 0
+    mps = getattr(torch.backends, "mps", None)
+    return "mps" if mps is not None and mps.is_available() else -1
+
+# Main logic to generate and validate answers. Pass an enabled GenerationProfiler
+# to record where the time goes (see profiling.py). device is where the NLI model
+# runs, as returned by nli_device() (-1 for CPU, 0 for the first CUDA GPU).
+def generate_answers(description, questions, profiler=None, device=-1):
+    profiler = profiler or GenerationProfiler(enabled=False)
     no_info = "Information not found"
-    description_chunks = chunk_text(description, 600, 10)
     answers = []
 
     try:
+        with profiler.stage("load_models"):
+            # Requests are spread across the Ollama servers listed in OLLAMA_URLS
+            llm = PooledChatOllama("llama3.1", temperature=0)
+            # Loaded once per process (see nli_loader.py for memory-mapped weights)
+            nli_model = nli_loader.get_nli_pipeline(device=device)
+        with profiler.stage("chunk_description"):
+            description_chunks = chunk_text(description, 600, 10)
+        profiler.describe(description, description_chunks)
+
         for question in questions:
-            # Prompt LLM to generate answer based solely on description
-            prompt = f"""
+            with profiler.question(question):
+                # Prompt LLM to generate answer based solely on description
+                prompt = f"""
             Company Description: ""{description}""
 
             Question: ""{question}""
@@ -283,37 +352,43 @@ def generate_answers(description, questions):
             - Everything should be in plain text. Do not include any formatting or special characters.
             - Be descriptive and provide concrete detail.
 """
-            answer = llm.invoke(prompt).content
-
-            # Check for hallucinated chunks and attempt to correct up to 2 times
-            for attempts in range(3):
-                chunks = chunk_text(answer)
-                bad_chunks = []
-
-                for chunk in chunks:
-                    bad_one = True
-                    for description_chunk in description_chunks:
-                        if not check_hallucination(nli_model, chunk, description_chunk):
-                            bad_one = False
+                answer = timed_invoke(llm, prompt, profiler, "answer").content
+
+                # Check for hallucinated chunks and attempt to correct up to 2 times
+                for attempts in range(3):
+                    with profiler.attempt(attempts):
+                        with profiler.stage("chunk_text"):
+                            chunks = chunk_text(answer)
+                        bad_chunks = []
+
+                        with profiler.stage("nli"):
+                            for chunk in chunks:
+                                bad_one = True
+                                for description_chunk in description_chunks:
+                                    if not check_hallucination(nli_model, chunk, description_chunk, profiler):
+                                        bad_one = False
+                                        break
+                                if bad_one:
+                                    bad_chunks.append(chunk)
+                        profiler.record(answer_chunks=len(chunks), bad_chunks=len(bad_chunks))
+
+                        if not bad_chunks:
+                            break  # All content is grounded
+                        elif attempts == 2:
+                            answer = no_info  # Fallback if unable to fix hallucinations
+                            profiler.record_fallback()
                             break
-                    if bad_one:
-                        bad_chunks.append(chunk)
-
-                if not bad_chunks:
-                    break  # All content is grounded
-                elif attempts == 2:
-                    answer = no_info  # Fallback if unable to fix hallucinations
-                    break
-                else:
-                    # Regenerate using only grounded content
-                    answer = regenerate_answer(llm, "\n".join(bad_chunks), description, question, answer)
+                        else:
+                            # Regenerate using only grounded content
+                            answer = regenerate_answer(llm, "\n".join(bad_chunks), description, question, answer, profiler)
 
-            answers.append(answer)
+                answers.append(answer)
 
     except Exception as e:
         print(f"Error generating answers: {e}")
         answers = ["Error generating answer" for _ in questions]
 
+    profiler.finish()
     return answers
 
 
@@ -0,0 +1,211 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional
+
+try:
+    import fcntl
+except ImportError:                     # Windows: concurrent first-time exports are not serialized
+    fcntl = None
+
+NLI_MODEL = "facebook/bart-large-mnli"
+
+# "copy": each process reads its own copy of the weights through pipeline(...).
+# "mmap" (opt-in): load them from a local safetensors export that is memory-mapped, so
+# Streamlit processes on one machine can share one copy in the page cache. With the
+# pinned transformers, which already maps safetensors checkpoints, it measured no
+# memory saving over "copy" (see benchmarks/bench_nli_mmap.py).
+NLI_WEIGHTS = os.getenv("NLI_WEIGHTS", "copy")
+
+# Where the safetensors export lives; all workers must point to the same directory to share pages
+NLI_WEIGHTS_DIR = os.getenv("NLI_WEIGHTS_DIR", os.path.join(os.path.expanduser("~"), ".cache", "mentor-ai", "nli"))
+
+WEIGHTS_FILE = "model.safetensors"
+
+# safetensors dtype names -> torch dtype attribute names
+DTYPES = {
+    "F64": "float64", "F32": "float32", "F16": "float16", "BF16": "bfloat16",
+    "I64": "int64", "I32": "int32", "I16": "int16", "I8": "int8", "U8": "uint8", "BOOL": "bool",
+}
+
+
+# How the NLI model was loaded in this process
+@dataclass
+class LoadInfo:
+    model: str
+    mode: str                           # "mmap" or "copy"
+    device: object
+    seconds: float                      # Cold load, including a first-time export
+    path: Optional[str] = None          # safetensors file backing the weights in mmap mode
+    exported: bool = False              # This process wrote the safetensors export
+    error: Optional[str] = None         # Why mmap mode fell back to "copy"
+
+
+_pipelines: Dict[tuple, object] = {}
+_load_info: Dict[tuple, LoadInfo] = {}
+_lock = threading.Lock()
+
+
+def export_dir(model_name: str, root: str = NLI_WEIGHTS_DIR) -> str:
+    return os.path.join(root, model_name.replace("/", "--"))
+
+
+# Writes config, tokenizer and a single safetensors weights file for model_name, once.
+# Workers starting together take turns on a lock file; the directory only appears
+# (atomically renamed into place) once it is complete.
+def export_weights(model_name: str = NLI_MODEL, root: str = NLI_WEIGHTS_DIR) -> bool:
+    target = export_dir(model_name, root)
+    if os.path.isfile(os.path.join(target, WEIGHTS_FILE)):
+        return False
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, ".export.lock"), "w") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        if os.path.isfile(os.path.join(target, WEIGHTS_FILE)):
+            return False
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        staging = tempfile.mkdtemp(prefix=".export-", dir=root)
+        try:
+            model = AutoModelForSequenceClassification.from_pretrained(model_name)
+            model.save_pretrained(staging, safe_serialization=True, max_shard_size="1000GB")
+            AutoTokenizer.from_pretrained(model_name).save_pretrained(staging)
+            # Readable by workers running as other users (mkdtemp creates the directory 0700)
+            os.chmod(staging, 0o755)
+            for name in os.listdir(staging):
+                os.chmod(os.path.join(staging, name), 0o644)
+            os.replace(staging, target)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+    return True
+
+
+# Tensors of a safetensors file as views into one read-only, copy-on-write mapping
+# of it: nothing is read until used, and clean pages are shared between processes.
+def mmap_state_dict(path: str) -> dict:
+    import torch
+
+    with open(path, "rb") as f:
+        header_size = int.from_bytes(f.read(8), "little")
+        header = json.loads(f.read(header_size))
+    base = 8 + header_size
+    size = os.path.getsize(path)
+    storage = torch.UntypedStorage.from_file(path, shared=False, nbytes=size)
+    data = torch.empty(0, dtype=torch.uint8).set_(storage)
+
+    tensors = {}
+    for name, entry in header.items():
+        if name == "__metadata__":
+            continue
+        start, end = entry["data_offsets"]
+        raw = data[base + start:base + end]
+        dtype = getattr(torch, DTYPES[entry["dtype"]])
+        try:
+            tensor = raw.view(dtype)
+        except RuntimeError:            # Misaligned offset (file not written by save_pretrained)
+            tensor = raw.clone().view(dtype)
+        tensors[name] = tensor.view(entry["shape"])
+    return tensors
+
+
+# Builds the model without allocating weights, then points its parameters at the mapping
+def load_mmap_model(directory: str):
+    import torch
+    from transformers import AutoConfig, AutoModelForSequenceClassification
+    from transformers.modeling_utils import no_init_weights
+
+    config = AutoConfig.from_pretrained(directory)
+    # Random initialization is skipped: every weight is replaced by the mapped one below
+    with no_init_weights(), torch.device("meta"):
+        model = AutoModelForSequenceClassification.from_config(config)
+    model.load_state_dict(mmap_state_dict(os.path.join(directory, WEIGHTS_FILE)), strict=False, assign=True)
+    model.tie_weights()                 # Shared embeddings are stored once in the export
+    missing = [name for name, tensor in [*model.named_parameters(), *model.named_buffers()] if tensor.is_meta]
+    if missing:
+        raise RuntimeError(f"weights missing from {directory}: {', '.join(missing[:5])}")
+    return model.eval()
+
+
+def _load(model_name: str, device, mode: str):
+    from transformers import pipeline
+
+    if mode == "mmap":
+        start = time.perf_counter()
+        try:
+            from transformers import AutoTokenizer
+
+            exported = export_weights(model_name)
+            directory = export_dir(model_name)
+            model = load_mmap_model(directory)
+            nli = pipeline("zero-shot-classification", model=model,
+                           tokenizer=AutoTokenizer.from_pretrained(directory), device=device)
+            return nli, LoadInfo(model_name, "mmap", device, time.perf_counter() - start,
+                                 os.path.join(directory, WEIGHTS_FILE), exported)
+        except Exception as e:          # Unwritable cache dir, unusual checkpoint...: load it the usual way
+            print(f"Memory-mapped NLI weights unavailable ({e}); loading a private copy instead")
+            error = str(e)
+    else:
+        error = None
+
+    start = time.perf_counter()
+    nli = pipeline("zero-shot-classification", model=model_name, device=device)
+    return nli, LoadInfo(model_name, "copy", device, time.perf_counter() - start, error=error)
+
+
+# Zero-shot NLI pipeline, loaded once per process and device and reused by every run
+def get_nli_pipeline(model_name: str = NLI_MODEL, device=-1, mode: str = NLI_WEIGHTS):
+    key = (model_name, device, mode)
+    with _lock:
+        if key not in _pipelines:
+            _pipelines[key], _load_info[key] = _load(model_name, device, mode)
+        return _pipelines[key]
+
+
+def load_info() -> Optional[dict]:
+    with _lock:
+        return asdict(next(reversed(_load_info.values()))) if _load_info else None
+
+
+def _kb_fields(lines, wanted):
+    values = {}
+    for line in lines:
+        key, _, rest = line.partition(":")
+        if key in wanted:
+            values[key] = int(rest.split()[0])
+    return values
+
+
+# Resident, proportional and shared memory of this process in MB, from /proc (Linux only),
+# plus how much of the memory-mapped weights file is resident and shared with other workers
+def memory_report(weights_path: Optional[str] = None) -> Optional[dict]:
+    fields = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            totals = _kb_fields(f, fields)
+    except OSError:
+        return None
+
+    mb = lambda kb: round(kb / 1024, 1)
+    report = {
+        "rss_mb": mb(totals.get("Rss", 0)),
+        "pss_mb": mb(totals.get("Pss", 0)),
+        "shared_mb": mb(totals.get("Shared_Clean", 0) + totals.get("Shared_Dirty", 0)),
+        "private_mb": mb(totals.get("Private_Clean", 0) + totals.get("Private_Dirty", 0)),
+    }
+    if weights_path:
+        weights = dict.fromkeys(fields, 0)
+        with open("/proc/self/smaps") as f:
+            in_mapping = False
+            for line in f:
+                if "-" in line.split(" ", 1)[0]:          # Header line of the next mapping
+                    in_mapping = line.rstrip().endswith(weights_path)
+                elif in_mapping:
+                    for key, value in _kb_fields([line], fields).items():
+                        weights[key] += value
+        report["weights_rss_mb"] = mb(weights["Rss"])
+        report["weights_shared_mb"] = mb(weights["Shared_Clean"] + weights["Shared_Dirty"])
+    return report
@@ -0,0 +1,149 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import fpdf
+from fpdf import FPDF
+
+# Parse the TTF on every build instead of writing .pkl metrics next to the font file,
+# which fails for read-only system font directories. Rendered bytes are cached below instead.
+fpdf.set_global("FPDF_CACHE_MODE", 1)
+
+TITLE = "Seed Grant Application"
+
+# Unicode fonts are looked up in this order; PDF_FONT_PATH overrides everything.
+# If none exist, the core Arial font is used and non latin-1 characters are replaced.
+FONT_CANDIDATES = [
+    os.environ.get("PDF_FONT_PATH", ""),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "DejaVuSans.ttf"),
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/TTF/DejaVuSans.ttf",
+    "/Library/Fonts/Arial Unicode.ttf",
+    "C:\\Windows\\Fonts\\arial.ttf",
+]
+
+WRITE_CHUNK_SIZE = 64 * 1024
+
+
+# Returns the first unicode font on disk, or None to fall back to the core fonts
+def find_unicode_font():
+    for path in FONT_CANDIDATES:
+        if path and os.path.isfile(path):
+            return path
+    return None
+
+
+# Stable cache key for a question/answer set (and the font it would be rendered with)
+def answers_digest(questions, answers, font_path=None):
+    digest = hashlib.sha256()
+    digest.update((font_path or "core").encode("utf-8"))
+    for question, answer in zip(questions, answers):
+        for text in (question, answer or ""):
+            encoded = text.encode("utf-8")
+            digest.update(len(encoded).to_bytes(8, "little"))
+            digest.update(encoded)
+    return digest.hexdigest()
+
+
+def _setup_fonts(pdf, font_path):
+    if not font_path:
+        return "Arial", lambda text: text.encode("latin-1", "replace").decode("latin-1")
+
+    pdf.add_font("Unicode", "", font_path, uni=True)
+    bold_path = font_path.replace(".ttf", "-Bold.ttf")
+    pdf.add_font("Unicode", "B", bold_path if os.path.isfile(bold_path) else font_path, uni=True)
+    return "Unicode", lambda text: text
+
+
+# Lays out the document; answers may be any iterable so batch callers can feed a generator
+def _render(questions, answers, font_path):
+    pdf = FPDF()
+    pdf.add_page()
+    family, clean = _setup_fonts(pdf, font_path)
+
+    # Add title
+    pdf.set_font(family, 'B', 16)
+    pdf.cell(200, 10, txt=TITLE, ln=True, align='C')
+    pdf.ln(10)
+
+    # List each question and answer pair
+    for question, answer in zip(questions, answers):
+        pdf.set_font(family, 'B', 12)
+        pdf.multi_cell(0, 10, txt=clean(question))
+        pdf.set_font(family, size=12)
+        pdf.multi_cell(0, 10, txt=clean(answer or ""))
+        pdf.ln(5)
+
+    pdf.close()
+    return pdf
+
+
+# Builds the PDF and returns it as bytes
+def build_pdf(questions, answers, font_path=None):
+    if font_path is None:
+        font_path = find_unicode_font()
+    # fpdf keeps binary data in a latin-1 str; every code point is < 256 once rendered
+    return _render(questions, answers, font_path).buffer.encode("latin-1")
+
+
+# Builds the PDF and writes it to a path or binary stream in chunks, without
+# materializing a second full-size bytes copy of the document
+def write_pdf(questions, answers, dest, font_path=None):
+    if font_path is None:
+        font_path = find_unicode_font()
+    buffer = _render(questions, answers, font_path).buffer
+
+    if isinstance(dest, (str, os.PathLike)):
+        with open(dest, "wb") as f:
+            return _write_chunks(buffer, f)
+    return _write_chunks(buffer, dest)
+
+
+def _write_chunks(buffer, stream):
+    written = 0
+    for start in range(0, len(buffer), WRITE_CHUNK_SIZE):
+        written += stream.write(buffer[start:start + WRITE_CHUNK_SIZE].encode("latin-1"))
+    return written
+
+
+# Bounded LRU cache of rendered PDFs keyed by answers_digest; a PDF is only
+# built the first time a given answer set is requested
+class PDFExportCache:
+    def __init__(self, max_entries=16):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, questions, answers, font_path=None):
+        if font_path is None:
+            font_path = find_unicode_font()
+        questions, answers = list(questions), list(answers)
+        key = answers_digest(questions, answers, font_path)
+
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            self.misses += 1
+
+        content = build_pdf(questions, answers, font_path)
+
+        with self._lock:
+            self._entries[key] = content
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return content
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Module level so the cache survives Streamlit reruns of the main script
+pdf_cache = PDFExportCache()
+
@@ -0,0 +1,179 @@
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+# Stages timed inside generate_answers; anything else counts as "other"
+STAGES = ("load_models", "chunk_description", "llm", "chunk_text", "nli")
+
+
+# (input, output) token counts Ollama reported for a LangChain message
+def token_usage(message):
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    metadata = getattr(message, "response_metadata", None) or {}
+    return metadata.get("prompt_eval_count", 0), metadata.get("eval_count", 0)
+
+
+# ---- Optional profile of one generate_answers run. Time is recorded per stage
+# (LLM calls, chunk_text, NLI scoring, model loading) for the whole run, for each
+# question and for each validation attempt, along with NLI call counts, tokens in/out
+# and how many hallucination retries each question needed. A disabled profiler does
+# nothing, so generate_answers can use one unconditionally.
+class GenerationProfiler:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.started_at = time.time()
+        self.total_seconds = 0.0
+        self.description = {}
+        self.setup = self._scope()
+        self.questions = []
+        self._scopes = [self.setup]
+        self._start = time.perf_counter()
+
+    @staticmethod
+    def _scope(**fields):
+        return {**fields, "seconds": 0.0, "stages": defaultdict(float), "nli_calls": 0}
+
+    def describe(self, description, description_chunks):
+        if self.enabled:
+            self.description = {
+                "chars": len(description),
+                "words": len(description.split()),
+                "chunks": len(description_chunks),
+            }
+
+    @contextmanager
+    def _enter(self, scope):
+        self._scopes.append(scope)
+        start = time.perf_counter()
+        try:
+            yield scope
+        finally:
+            scope["seconds"] = time.perf_counter() - start
+            self._scopes.pop()
+
+    # Everything recorded inside belongs to this question
+    def question(self, question):
+        if not self.enabled:
+            return nullcontext()
+        scope = self._scope(question=question, llm_calls=[], attempts=[], retries=0, fell_back=False)
+        self.questions.append(scope)
+        return self._enter(scope)
+
+    # One round of hallucination checking of the current answer
+    def attempt(self, number):
+        if not self.enabled:
+            return nullcontext()
+        scope = self._scope(attempt=number, answer_chunks=0, bad_chunks=0)
+        self._scopes[-1]["attempts"].append(scope)
+        return self._enter(scope)
+
+    # Adds the time spent inside to a stage of the current attempt/question and its parents
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            for scope in self._scopes:
+                scope["stages"][name] += elapsed
+
+    def record(self, **values):
+        if self.enabled:
+            self._scopes[-1].update(values)
+
+    def record_nli_call(self):
+        if self.enabled:
+            for scope in self._scopes:
+                scope["nli_calls"] += 1
+
+    def _question_scope(self):
+        return next((scope for scope in reversed(self._scopes) if "llm_calls" in scope), None)
+
+    # The answer could not be grounded and was replaced with the fallback text
+    def record_fallback(self):
+        question = self._question_scope() if self.enabled else None
+        if question is not None:
+            question["fell_back"] = True
+
+    # kind is "answer" or "regenerate"; regenerations count as hallucination retries
+    def record_llm_call(self, kind, message, seconds):
+        question = self._question_scope() if self.enabled else None
+        if question is None:
+            return
+        input_tokens, output_tokens = token_usage(message)
+        question["llm_calls"].append({
+            "kind": kind,
+            "seconds": round(seconds, 3),
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+        })
+        if kind == "regenerate":
+            question["retries"] += 1
+
+    def finish(self):
+        if self.enabled:
+            self.total_seconds = time.perf_counter() - self._start
+
+    # JSON-ready summary: run totals, per-stage breakdown, slowest questions and full detail
+    def summary(self, slowest=3):
+        def stages(scope):
+            timed = {name: round(scope["stages"].get(name, 0.0), 3) for name in STAGES if name in scope["stages"]}
+            timed["other"] = round(max(scope["seconds"] - sum(scope["stages"].values()), 0.0), 3)
+            return timed
+
+        def question_summary(q):
+            return {
+                "question": q["question"],
+                "seconds": round(q["seconds"], 3),
+                "stages": stages(q),
+                "nli_calls": q["nli_calls"],
+                "input_tokens": sum(c["input_tokens"] for c in q["llm_calls"]),
+                "output_tokens": sum(c["output_tokens"] for c in q["llm_calls"]),
+                "retries": q["retries"],
+                "fell_back": q["fell_back"],
+                "llm_calls": q["llm_calls"],
+                "attempts": [
+                    {
+                        "attempt": a["attempt"],
+                        "seconds": round(a["seconds"], 3),
+                        "stages": stages(a),
+                        "nli_calls": a["nli_calls"],
+                        "answer_chunks": a["answer_chunks"],
+                        "bad_chunks": a["bad_chunks"],
+                    }
+                    for a in q["attempts"]
+                ],
+            }
+
+        run = {**self.setup, "seconds": self.total_seconds}
+        questions = [question_summary(q) for q in self.questions]
+        return {
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_at)),
+            "total_seconds": round(self.total_seconds, 3),
+            "description": self.description,
+            "stages": stages(run),
+            "totals": {
+                "questions": len(questions),
+                "llm_calls": sum(len(q["llm_calls"]) for q in questions),
+                "nli_calls": self.setup["nli_calls"],
+                "input_tokens": sum(q["input_tokens"] for q in questions),
+                "output_tokens": sum(q["output_tokens"] for q in questions),
+                "retries": sum(q["retries"] for q in questions),
+                "fallbacks": sum(q["fell_back"] for q in questions),
+            },
+            "slowest_questions": [
+                {key: q[key] for key in ("question", "seconds", "nli_calls", "retries")}
+                for q in sorted(questions, key=lambda q: q["seconds"], reverse=True)[:slowest]
+            ],
+            "questions": questions,
+        }
+
+    def to_json(self, indent=2):
+        return json.dumps(self.summary(), indent=indent)
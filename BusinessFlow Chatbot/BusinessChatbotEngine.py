@@ -1,14 +1,15 @@
-import yaml
-import os
-from langchain_community.chat_models import ChatOllama
 from langgraph.graph import StateGraph, END
-from typing import TypedDict, Dict, List
+from typing import TypedDict, Dict, List, Tuple
+from langchain_core.messages import AIMessage
 import asyncio
-# To use Anthropic's Claude model, uncomment the following lines:
-# from langchain_anthropic import ChatAnthropic
-# from dotenv import load_dotenv
-
-# load_dotenv()
+from prompt_registry import registry
+from context_budget import ContextBudget
+from ollama_session import OllamaPrefixSession
+from completeness import CompletenessGate, gate_stats
+from semantic_cache import followup_cache, fingerprint
+from model_router import ModelRouter
+from metrics import NODE_SECONDS, LLM_SECONDS, LLM_ERRORS, THINK_SECONDS, PROMPT_TOKENS_SAVED, token_usage, record_tokens, spans
+import time
 
 # ---- TypedDict defining the structure of the state used in the business plan process
 class BusinessPlanState(TypedDict):    
@@ -21,24 +22,66 @@ class BusinessPlanState(TypedDict):
 
 class BusinessPlanBuilder:
     def __setup(self):
-        # Initialize the language model (ChatOllama using llama3.1 running on CUDA)
-        self.llm = ChatOllama(model="llama3.1", device="cuda", temperature=0)
-        # self.llm = ChatAnthropic(model="claude-3-opus-20240229", temperature=0, anthropic_api_key=os.getenv("ANTHROPIC_API_KEY"))
-
-
-        # Load prompt templates from prompts.yaml
-        def load_custom_prompts():
-            current_dir = ""
-            yaml_path = os.path.join(current_dir, "prompts.yaml")
-            with open(yaml_path, "r") as f:
-                data = yaml.safe_load(f)
-            return data.get("customs", {})
-
-        self.customs = load_custom_prompts()
+        # Pin this session to the current version of prompts.yaml; later edits
+        # made through the admin panel only affect sessions started afterwards
+        self.prompts = registry.current()
+        self.customs = self.prompts.customs
+
+        # Initialize the language models (pooled ChatOllama clients, llama3.1 unless
+        # settings.models in prompts.yaml assigns a different model to a graph node)
+        self.models = ModelRouter(self.prompts.settings)
+        self.followup_llm = self.models.llm("Ask Followup Question")
+        self.compile_llm = self.models.llm("Compile Plan")
+        self.summarize_llm = self.models.llm("Summarize Section")
 
         # Extract section names and their associated prompt questions
-        self.SECTIONS = [s["name"] for s in self.customs["sections"]]
-        self.QUESTIONS = {s["name"]: s["prompt"] for s in self.customs["sections"]}
+        self.SECTIONS = list(self.prompts.sections)
+        self.QUESTIONS = self.prompts.questions
+
+        # Keeps the compile-plan prompt within the token budget from prompts.yaml settings
+        context_settings = self.prompts.settings.get("context", {})
+        self.context = ContextBudget(
+            summarize=self.__summarize_section if "summarize_prompt" in self.prompts.templates else None,
+            max_prompt_tokens=context_settings.get("max_prompt_tokens", 3000),
+            section_tokens=context_settings.get("section_tokens", 600),
+        )
+        self.context_stats = None
+
+        # Optional local check that skips the follow-up LLM call when the first answer is already complete
+        gate_settings = self.prompts.settings.get("completeness_gate", {})
+        self.completeness_gate = None
+        if gate_settings.get("enabled"):
+            self.completeness_gate = CompletenessGate(
+                min_coverage=gate_settings.get("min_coverage", 1.0),
+                min_words=gate_settings.get("min_words", 25),
+            )
+
+        # Optional follow-up mode that reuses Ollama's cached prompt prefix and context per session
+        followup_settings = self.prompts.settings.get("followup", {})
+        self.followup_session = None
+        if followup_settings.get("prefix_cache"):
+            followup_model, followup_options = self.models.spec("Ask Followup Question")
+            self.followup_session = OllamaPrefixSession(
+                model=followup_model,
+                template=self.prompts.templates["followup_prompt"],
+                keep_alive=followup_settings.get("keep_alive", "30m"),
+                options=followup_options,
+                max_context_tokens=followup_settings.get("max_context_tokens", 4096),
+                split_prefix=followup_settings.get("split_prefix", False),
+                carry_context=followup_settings.get("carry_context", False),
+            )
+
+        # Optional process-wide cache that reuses the follow-up generated for a near-identical
+        # first answer; keyed by the follow-up prompt and model, so editing them invalidates it
+        cache_settings = self.prompts.settings.get("followup_cache", {})
+        self.cache_threshold = None
+        if cache_settings.get("enabled"):
+            self.cache_threshold = cache_settings.get("threshold", 0.92)
+            followup_cache.max_entries = cache_settings.get("max_entries", 1000)
+            self.cache_fingerprint = fingerprint(self.prompts.templates["followup_prompt"], *self.models.spec("Ask Followup Question"))
+
+        # Sessions waiting this long for user input end themselves and release their resources
+        self.idle_timeout = self.prompts.settings.get("session", {}).get("idle_timeout_seconds", 3600)
 
         # Async coordination primitives for input/output synchronization
         self.allow_input_condition = asyncio.Condition()
@@ -52,9 +95,9 @@ class BusinessPlanBuilder:
         graph = StateGraph(BusinessPlanState)
         
         # Define each logical step (node) in the workflow
-        graph.add_node("Ask Initial Question", self.__ask_initial_question)
-        graph.add_node("Ask Followup Question", self.__ask_followup_question)
-        graph.add_node("Compile Plan", self.__compile_business_plan)
+        graph.add_node("Ask Initial Question", self.__timed("Ask Initial Question", self.__ask_initial_question))
+        graph.add_node("Ask Followup Question", self.__timed("Ask Followup Question", self.__ask_followup_question))
+        graph.add_node("Compile Plan", self.__timed("Compile Plan", self.__compile_business_plan))
 
         # Define the path through the graph
         graph.add_edge("Ask Initial Question", "Ask Followup Question")
@@ -78,6 +121,23 @@ class BusinessPlanBuilder:
         self.allow_input = False
         self.is_output_ready = False
         self.last_served_output = ""
+        self.output_seq = 0                 # Bumped each time new output is published, for /status long-polls
+
+        # Cancellation state: the running graph task and any LLM requests it is waiting on
+        self.graph_task = None
+        self.cancelled = False
+        self.last_active = time.monotonic()
+        self._llm_tasks = set()
+
+        # Tracing: set by the backend; a turn is one user input
+        self.session_id = None
+        self.turn = 0
+        self.think_seconds = 0.0            # Total time spent waiting for the user
+
+        # Non-interactive mode (build_plan): answers supplied up front instead of through /step
+        self.scripted_answers = None        # Section -> first answer
+        self.scripted_followups = None      # Section -> (follow-up question, its answer or None if unanswered)
+        self.plan_stream = None             # Optional asyncio.Queue receiving the plan as it is generated
 
     # Starts execution of the graph with initial state
     async def invoke(self):
@@ -89,9 +149,163 @@ class BusinessPlanBuilder:
             "history": {},
         }, {"recursion_limit": 1000})
 
+    # Runs the graph in a background task owned by this builder, so it can be cancelled
+    def start(self) -> asyncio.Task:
+        self.graph_task = asyncio.create_task(self.invoke())
+        self.graph_task.add_done_callback(self.__on_graph_done)
+        return self.graph_task
+
+    def __on_graph_done(self, task: asyncio.Task):
+        # Background summaries are useless once the graph has finished or been cancelled
+        self.context.discard()
+        self.allow_input = False
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Business plan graph failed: {task.exception()}")
+        # Release a request handler still waiting for output (e.g. after "exit")
+        if not self.cancelled:
+            asyncio.get_running_loop().create_task(self.__publish_output())
+
+    # Marks self.output as ready and wakes up every request waiting for it
+    async def __publish_output(self):
+        async with self.output_ready_condition:
+            self.is_output_ready = True
+            self.output_seq += 1
+            self.output_ready_condition.notify_all()
+
+    # Waits until output newer than after_seq is published (or the session is cancelled);
+    # returns False on timeout
+    async def wait_for_output(self, after_seq: int, timeout: float) -> bool:
+        async with self.output_ready_condition:
+            try:
+                await asyncio.wait_for(
+                    self.output_ready_condition.wait_for(lambda: self.output_seq > after_seq or self.cancelled),
+                    timeout=timeout
+                )
+                return True
+            except asyncio.TimeoutError:
+                return False
+
+    # Aborts everything this session is doing: pending LLM requests (closing their
+    # HTTP connections makes Ollama stop generating), background summaries and the
+    # graph task itself, then wakes up any request handler waiting on this session
+    async def cancel(self, reason: str = "Session ended."):
+        if self.cancelled:
+            return
+        self.cancelled = True
+        self.allow_input = False
+
+        for task in list(self._llm_tasks):
+            task.cancel()
+        self.context.discard()
+        if self.graph_task is not None and not self.graph_task.done():
+            self.graph_task.cancel()
+            try:
+                await self.graph_task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+        self.output = reason
+        self.output_seq += 1
+        for condition in (self.input_processed_condition, self.output_ready_condition):
+            async with condition:
+                condition.notify_all()
+
+    # Wraps a graph node to record how long it took, not counting time spent waiting for the user
+    def __timed(self, name: str, node):
+        async def timed_node(state: BusinessPlanState):
+            wall, start, turn, think_before = time.time(), time.perf_counter(), self.turn, self.think_seconds
+            try:
+                return await node(state)
+            finally:
+                elapsed = time.perf_counter() - start - (self.think_seconds - think_before)
+                NODE_SECONDS.observe(elapsed, node=name)
+                spans.log("node", wall, elapsed, session_id=self.session_id, turn=turn, node=name)
+        return timed_node
+
+    # Every LLM request goes through here so cancel() can abort it. node names the
+    # graph node (as in settings.models) the request is made for, for metrics.
+    async def __run_llm(self, coro, node: str):
+        model = self.models.spec(node)[0]
+        task = asyncio.create_task(coro)
+        self._llm_tasks.add(task)
+        wall, start = time.time(), time.perf_counter()
+        outcome, usage = "ok", None
+        try:
+            result = await task
+            usage = token_usage(result)
+            return result
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            self._llm_tasks.discard(task)
+            elapsed = time.perf_counter() - start
+            if outcome == "ok":
+                LLM_SECONDS.observe(elapsed, node=node, model=model)
+                record_tokens(node, model, usage)
+            else:
+                LLM_ERRORS.inc(node=node, model=model, reason=outcome)
+            spans.log(
+                "llm", wall, elapsed, session_id=self.session_id, turn=self.turn, node=node, model=model,
+                outcome=outcome, input_tokens=usage[0] if usage else None, output_tokens=usage[1] if usage else None,
+            )
+
+    # Runs the whole graph without user interaction. followups maps a section to the
+    # follow-up question the caller answered and that answer; with generate_followups,
+    # questions are generated in parallel for the other answered sections and returned
+    # so the caller can collect their answers. The same nodes as an interactive session
+    # then record the answers and compile the plan once.
+    async def build_plan(self, answers: Dict[str, str], followups: Dict[str, Tuple[str, str]] = None,
+                         generate_followups: bool = False, plan_stream: asyncio.Queue = None) -> dict:
+        # Ended (client gone, /end) while waiting for a bulk slot: cancel() had no task to stop
+        if self.cancelled:
+            raise asyncio.CancelledError()
+        followups = {
+            section: (question.strip(), answer.strip())
+            for section, (question, answer) in (followups or {}).items()
+            if question.strip() and answer.strip()
+        }
+        self.scripted_answers = answers
+        self.plan_stream = plan_stream
+        if self.followup_session:
+            # Parallel follow-ups can't share one running context
+            self.followup_session.carry_context = False
+
+        wanted = [
+            section for section in self.SECTIONS
+            if generate_followups and answers.get(section, "").strip() and section not in followups
+        ]
+        questions = await asyncio.gather(*(
+            self.generate_followup(section, answers[section].strip()) for section in wanted
+        ))
+        generated = {section: question for section, question in zip(wanted, questions) if question is not None}
+        self.scripted_followups = {
+            **{section: (question, None) for section, question in generated.items()},
+            **followups,
+        }
+
+        if self.cancelled:
+            raise asyncio.CancelledError()
+        state = await self.start()
+        return {
+            "plan": state["responses"].get("Final Plan", ""),
+            "followup_questions": generated,
+            "prompt_tokens_saved": self.context_stats.saved_tokens if self.context_stats else 0,
+        }
+
+    def __scripted_input(self, section: str, is_followup_question: bool) -> str:
+        if is_followup_question:
+            return self.scripted_followups[section][1]
+        return self.scripted_answers.get(section, "").strip() or "skip"
+
     # Called by the backend when user input is received from the frontend
     async def set_user_input(self, user_input: str):
+        self.last_active = time.monotonic()
         if self.allow_input:
+            self.turn += 1
             async with self.allow_input_condition:
                 self.user_input = user_input
                 self.allow_input_condition.notify()
@@ -99,20 +313,24 @@ class BusinessPlanBuilder:
     # Waits for user input to arrive; handles timeout and notifies that input has been processed
     async def __wait_for_input(self, state: BusinessPlanState):
         self.allow_input = True
+        waiting_since = time.perf_counter()
 
         async with self.allow_input_condition:
             try:
                 await asyncio.wait_for(
                     self.allow_input_condition.wait_for(lambda: self.user_input != ""),
-                    timeout=3600  # 1 hour timeout
+                    timeout=self.idle_timeout
                 )
+                THINK_SECONDS.observe(time.perf_counter() - waiting_since)
             except asyncio.TimeoutError:
                 # Handle timeout by exiting the session
                 self.allow_input = False
-                self.output = "Timeout: No input received within 60 minutes."
+                self.output = f"Timeout: No input received within {self.idle_timeout // 60} minutes."
                 state["responses"]["Final Plan"] = "Timed out due to inactivity."
                 self.user_input = "exit"
                 return state
+            finally:
+                self.think_seconds += time.perf_counter() - waiting_since
 
         # After input is received, signal the backend that processing is complete
         async with self.input_processed_condition:
@@ -129,12 +347,13 @@ class BusinessPlanBuilder:
         self.user_input = ""
 
         # Notify frontend that output is ready
-        async with self.output_ready_condition:
-            self.is_output_ready = True
-            self.output_ready_condition.notify_all()
+        await self.__publish_output()
 
-        # Wait for user input
-        state = await self.__wait_for_input(state)
+        # Wait for user input (or take it from the supplied answers in a non-interactive run)
+        if self.scripted_answers is not None:
+            self.user_input = self.__scripted_input(section_name, is_followup_question)
+        else:
+            state = await self.__wait_for_input(state)
 
         # Handle special commands from user
         if self.user_input.lower() in ["exit", "back", "skip", "restart"]:
@@ -146,10 +365,14 @@ class BusinessPlanBuilder:
 
         # Handle control commands
         if self.user_input == "exit":
+            self.context.discard()
             return state
         elif self.user_input == "back":
             state["history"][section_name] = []
             state["responses"][section_name] = []
+            self.context.discard(section_name)
+            if self.followup_session:
+                self.followup_session.reset()
             if not is_followup_question:
                 state["going_back"] = True
                 state["current_section"] = max(state["current_section"] - 1, 0)
@@ -157,6 +380,9 @@ class BusinessPlanBuilder:
         elif self.user_input == "restart":
             state["history"].clear()
             state["responses"].clear()
+            self.context.discard()
+            if self.followup_session:
+                self.followup_session.reset()
             state["current_section"] = 0
             state["going_back"] = True
             return state
@@ -169,6 +395,7 @@ class BusinessPlanBuilder:
                 state["responses"][section_name] += "\n\nSkipped."
                 state["history"][section_name].append(f"Q: {question}\nA: Skipped.")
             state["current_section"] += 1
+            self.context.section_completed(section_name, state["history"][section_name])
             return state
 
         # Normal input
@@ -179,6 +406,7 @@ class BusinessPlanBuilder:
             state["responses"][section_name] += f"\n\n{self.user_input}"
             state["history"][section_name].append(f"Q: {question}\nA: {self.user_input}")
             state["current_section"] += 1
+            self.context.section_completed(section_name, state["history"][section_name])
 
         return state
 
@@ -209,16 +437,75 @@ class BusinessPlanBuilder:
         question = self.QUESTIONS[section]
         initial_response = state["responses"][section]
 
-        # Generate follow-up question using prompt template
-        followup_prompt = self.customs["followup_prompt"].format(
-            question=question, response=initial_response
-        )
-        followup_question = self.llm.invoke(followup_prompt).content.strip()
+        if self.scripted_answers is not None:
+            # Non-interactive run: follow-ups were generated up front, in parallel
+            followup_question = self.scripted_followups.get(section, (None, None))[0]
+        else:
+            followup_question = await self.generate_followup(section, initial_response)
+
+        # Nothing to ask (answer already complete, or no follow-up answer supplied): move on
+        if followup_question is None or (
+            self.scripted_answers is not None and not self.scripted_followups[section][1]
+        ):
+            state["current_section"] += 1
+            self.context.section_completed(section, state["history"][section])
+            return state
 
         self.output = f"**{section}** - \n{followup_question}"
-        state = await self.__input_handler(state, section, question, is_followup_question=True)
+        # History records the follow-up actually asked, so the compiled plan sees what was answered
+        state = await self.__input_handler(state, section, followup_question, is_followup_question=True)
         return state
 
+    # Generates the follow-up question for a section's first answer, or returns None
+    # when the completeness gate finds nothing missing
+    async def generate_followup(self, section: str, initial_response: str):
+        question = self.QUESTIONS[section]
+
+        # Answer already covers every sub-question: no need to call the LLM
+        if self.completeness_gate:
+            complete = self.completeness_gate.is_complete(question, initial_response)
+            gate_stats.record_check(skipped=complete)
+            if complete:
+                return None
+
+        # A follow-up built on earlier sections' context is specific to this session: don't share it
+        use_cache = self.cache_threshold is not None and not (self.followup_session and self.followup_session.carry_context)
+        if use_cache:
+            cached, vector = followup_cache.lookup(
+                self.prompts.version, self.cache_fingerprint, question, initial_response, self.cache_threshold
+            )
+            if cached is not None:
+                return cached
+
+        # Generate follow-up question using prompt template
+        llm_start = time.perf_counter()
+        if self.followup_session:
+            followup_message = await self.__run_llm(
+                self.__session_followup(question, initial_response), "Ask Followup Question"
+            )
+        else:
+            followup_prompt = self.prompts.templates["followup_prompt"].format(
+                question=question, response=initial_response
+            )
+            followup_message = await self.__run_llm(self.followup_llm.ainvoke(followup_prompt), "Ask Followup Question")
+        followup_question = followup_message.content.strip()
+        llm_seconds = time.perf_counter() - llm_start
+        gate_stats.record_llm_call(llm_seconds)
+        if use_cache:
+            followup_cache.store(
+                self.prompts.version, self.cache_fingerprint, question, vector, followup_question, llm_seconds
+            )
+        return followup_question
+
+    # Follow-up through the prefix-cached session, wrapped in a message like ChatOllama's
+    # so __run_llm can read its token counts
+    async def __session_followup(self, question: str, initial_response: str) -> AIMessage:
+        text = await self.followup_session.generate(question=question, response=initial_response)
+        input_tokens, output_tokens = self.followup_session.last_usage
+        return AIMessage(content=text, usage_metadata={
+            "input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens,
+        })
+
     # Determines what to do next in the graph after follow-up
     def __route_next(self, state: BusinessPlanState) -> str:
         if self.user_input == "exit":
@@ -228,25 +515,47 @@ class BusinessPlanBuilder:
         else:
             return "Ask Initial Question"
 
+    # Background summary of a long section, used by ContextBudget
+    async def __summarize_section(self, section: str, qa: str, max_tokens: int) -> str:
+        prompt = self.prompts.templates["summarize_prompt"].format(
+            section=section, qa=qa, max_words=int(max_tokens * 0.75)
+        )
+        return (await self.__run_llm(self.summarize_llm.ainvoke(prompt), "Summarize Section")).content
+
+    # Streams the plan into plan_stream as it is generated and returns the combined message
+    async def __stream_plan(self, prompt: str):
+        message = None
+        async for chunk in self.compile_llm.astream(prompt):
+            message = chunk if message is None else message + chunk
+            if chunk.content:
+                await self.plan_stream.put(chunk.content)
+        return message
+
     # Final step: compile a business plan from all previous Q&A
     async def __compile_business_plan(self, state: BusinessPlanState):
-        full_qa = "\n\n".join(["\n".join(qas) for qas in state["history"].values()])
-        prompt = self.customs["compile_plan_prompt"].format(all_qa=full_qa)
+        template = self.prompts.templates["compile_plan_prompt"]
+        full_qa, self.context_stats = await self.context.build(state["history"], template)
+        prompt = template.format(all_qa=full_qa)
+        PROMPT_TOKENS_SAVED.inc(self.context_stats.saved_tokens)
 
         # Generate the final plan
-        refined_business_plan = self.llm.invoke(prompt).content.strip()
+        if self.plan_stream is not None:
+            message = await self.__run_llm(self.__stream_plan(prompt), "Compile Plan")
+        else:
+            message = await self.__run_llm(self.compile_llm.ainvoke(prompt), "Compile Plan")
+        refined_business_plan = (message.content if message is not None else "").strip()
 
         disclaimer = (
             "\n\n📌 PLEASE NOTE: The generated business plan is a starting point and may require further refinement and correction."
         )
         refined_business_plan += disclaimer
+        if self.plan_stream is not None:
+            await self.plan_stream.put(disclaimer)
 
         # Save to state and output
         state["responses"]["Final Plan"] = refined_business_plan
         self.output = f"\n--- Your Complete Business Plan ---\n\n{refined_business_plan}"
 
-        async with self.output_ready_condition:
-            self.is_output_ready = True
-            self.output_ready_condition.notify_all()
+        await self.__publish_output()
 
         return state
@@ -0,0 +1,84 @@
+import os
+import time
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+API_URL = os.getenv("CHATBOT_API_URL", "http://localhost:8000")
+
+CONNECT_TIMEOUT = 3.05
+START_TIMEOUT = 60              # /start waits up to 30s server-side for the first question
+STEP_TIMEOUT = 15 * 60          # /step waits up to 10 min server-side for the next question or the plan
+END_TIMEOUT = 5
+STATUS_WAIT = 25                # Long-poll duration per /status request
+STATUS_MARGIN = 10              # Extra read time on top of the long-poll duration
+
+
+class ChatbotAPIError(RuntimeError):
+    pass
+
+
+# ---- HTTP client for the chatbot backend (main.py). One pooled keep-alive session
+# is shared by every call; connection failures are retried with backoff for all
+# requests, while read errors and 502/503/504 are only retried for idempotent GETs
+# so a /step is never submitted twice.
+class ChatbotClient:
+    def __init__(self, base_url: str = API_URL, retries: int = 3, backoff: float = 0.5, pool_size: int = 10):
+        self.base_url = base_url.rstrip("/")
+        self.http = requests.Session()
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET"}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.http.mount("http://", adapter)
+        self.http.mount("https://", adapter)
+
+    def _request(self, method: str, path: str, read_timeout: float, **kwargs) -> dict:
+        try:
+            res = self.http.request(method, f"{self.base_url}{path}", timeout=(CONNECT_TIMEOUT, read_timeout), **kwargs)
+            res.raise_for_status()
+            data = res.json()
+        except requests.RequestException as e:
+            raise ChatbotAPIError(f"{method} {path} failed: {e}") from e
+        if "error" in data:
+            raise ChatbotAPIError(data["error"])
+        return data
+
+    def start(self) -> dict:
+        return self._request("POST", "/start", START_TIMEOUT)
+
+    def status(self, session_id: str, after: int = -1, wait: float = 0) -> dict:
+        return self._request(
+            "GET", f"/status/{session_id}", wait + STATUS_MARGIN, params={"after": after, "wait": wait}
+        )
+
+    def step(self, session_id: str, user_input: str) -> dict:
+        return self._request("POST", "/step", STEP_TIMEOUT, json={"session_id": session_id, "user_input": user_input})
+
+    def end(self, session_id: str) -> Optional[dict]:
+        try:
+            return self._request("POST", "/end", END_TIMEOUT, json={"session_id": session_id})
+        except ChatbotAPIError:
+            return None
+
+    # Creates exactly one session and long-polls it until its first question is ready
+    def start_session(self, max_wait: float = 180) -> dict:
+        data = self.start()
+        deadline = time.monotonic() + max_wait
+        while not data.get("output"):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.end(data["session_id"])
+                raise ChatbotAPIError("Backend timed out waiting for initial output.")
+            status = self.status(data["session_id"], after=data.get("seq", 0), wait=min(STATUS_WAIT, remaining))
+            data = {**data, **status}
+        return data
@@ -0,0 +1,190 @@
+import re
+import threading
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Tuple
+
+WH_WORDS = r"(?:what|who|whom|whose|how|why|where|when|which|describe|explain|list)"
+
+STOPWORDS = frozenset("""
+a an the and or but if of to in on at by for with from as is are was were be been being do does did
+doing have has had having it its it's this that these those there their them they you your yours we
+our us i me my he she his her what who whom whose how why where when which will would can could
+should may might must shall about into over under than then so such very just also any each all
+some more most other own same not no nor only too describe explain list tell make makes made key
+main primary biggest major important business company
+""".split())
+
+# Words that count as evidence for a question keyword even if the keyword itself is absent.
+# Words are compared by stem; an entry ending in "*" also matches longer words starting
+# with it (only used for long, specific roots such as "competi*" -> "competition").
+SYNONYMS: Dict[str, Tuple[str, ...]] = {
+    "name": ("called", "named", "brand"),
+    "problem": ("issue", "pain", "challenge", "struggle", "difficult*", "lack", "gap", "frustrat*"),
+    "solve": ("solution", "address", "fix", "eliminat*", "reduc*", "prevent", "automat*"),
+    "unique": ("differen*", "unlike", "proprietary", "patent", "advantage", "novel", "innovat*", "exclusive"),
+    "audience": ("customer", "client", "user", "market", "segment", "consumer", "buyer", "target", "demographic"),
+    "target": ("customer", "client", "user", "market", "segment", "audience"),
+    "competitor": ("competi*", "rival", "alternative", "incumbent", "versus", "vs", "compared"),
+    "structure": ("llc", "corporation", "inc", "partnership", "sole", "proprietorship", "nonprofit", "c-corp", "s-corp", "owned", "founder"),
+    "team": ("founder", "ceo", "cto", "coo", "cfo", "member", "employee", "staff", "partner", "cofounder", "co-founder", "manager"),
+    "member": ("founder", "ceo", "cto", "coo", "cfo", "team", "employee", "partner", "cofounder", "co-founder"),
+    "product": ("service", "offer", "platform", "app", "tool", "software", "subscription", "sell"),
+    "service": ("product", "offer", "platform", "app", "tool", "software", "subscription", "sell"),
+    "offer": ("product", "service", "provide", "sell", "platform"),
+    "benefit": ("save", "improv*", "reduc*", "increas*", "faster", "cheaper", "easier", "enabl*"),
+}
+
+# Phrases that mark an answer as a placeholder rather than an answer
+HEDGES = (
+    "not sure", "unsure", "don't know", "dont know", "do not know", "no idea", "not yet", "haven't decided",
+    "have not decided", "undecided", "tbd", "to be determined", "figure it out", "think about it",
+)
+
+
+# Crude stemmer: good enough to match "competitors" with "competitor" or "solving" with "solve"
+def stem(word: str) -> str:
+    word = word.lower()
+    for suffix in ("ies", "es", "ing", "ed", "s"):
+        if len(word) > len(suffix) + 3 and word.endswith(suffix):
+            word = word[: -len(suffix)] + ("i" if suffix == "ies" else "")
+            break
+    # "service"/"services", "solve"/"solving" and "company"/"companies" share a stem
+    if len(word) > 3 and word[-1] in "ey":
+        word = word[:-1] + ("i" if word[-1] == "y" else "")
+    return word
+
+
+def _option(option: str) -> str:
+    return stem(option[:-1]) + "*" if option.endswith("*") else stem(option)
+
+
+_STEMMED_SYNONYMS = {stem(key): tuple(_option(o) for o in values) for key, values in SYNONYMS.items()}
+
+
+def words(text: str) -> List[str]:
+    return re.findall(r"[A-Za-z][A-Za-z'\-]*", text)
+
+
+# Splits a section prompt into its sub-questions, e.g. "What is its name, what problem
+# does it solve, and what makes it unique?" -> ["What is its name", "what problem ...", ...]
+@lru_cache(maxsize=256)
+def split_sub_questions(prompt: str) -> Tuple[str, ...]:
+    parts = []
+    for sentence in re.split(r"[?.!]\s*", prompt):
+        parts.extend(re.split(rf",?\s*(?:\band\s+|,\s*)(?={WH_WORDS}\b)", sentence, flags=re.IGNORECASE))
+    return tuple(p.strip() for p in parts if p and p.strip())
+
+
+# Keywords a sub-question asks about, each expanded with its synonyms
+@lru_cache(maxsize=1024)
+def sub_question_keywords(sub_question: str) -> Tuple[FrozenSet[str], ...]:
+    keywords = []
+    for word in words(sub_question):
+        if word.lower() in STOPWORDS:
+            continue
+        root = stem(word)
+        keywords.append(frozenset({root, *_STEMMED_SYNONYMS.get(root, ())}))
+    return tuple(keywords)
+
+
+def _mentions(answer_stems: FrozenSet[str], options: FrozenSet[str]) -> bool:
+    for option in options:
+        if option.endswith("*"):
+            if any(s.startswith(option[:-1]) for s in answer_stems):
+                return True
+        elif option in answer_stems:
+            return True
+    return False
+
+
+# A capitalized name introduced as the business, e.g. "We are Acme Health", "It's called
+# Brightly" or "Acme is a ..."; a capitalized word elsewhere ("talk to John") doesn't count
+_NAMING = re.compile(
+    r"(?i:\b(?:we are|we're|it is|it's|this is|called|named|name is)\s+)([A-Z][\w&'\-]*)"
+    r"|(?:^|[.!?]\s+)([A-Z][\w&'\-]*)(?:\s+[A-Z][\w&'\-]*)*\s+(?:is|are)\s+(?:a|an|the)\b"
+)
+
+
+def _names_business(answer: str) -> bool:
+    for match in _NAMING.finditer(answer.strip()):
+        name = match.group(1) or match.group(2)
+        if name.lower() not in STOPWORDS and name != "I":
+            return True
+    return False
+
+
+def _hedges(answer: str) -> bool:
+    text = " ".join(answer.lower().replace("\u2019", "'").split())
+    return any(re.search(rf"\b{re.escape(hedge)}\b", text) for hedge in HEDGES)
+
+
+@dataclass
+class GateStats:
+    checks: int = 0
+    skipped: int = 0                      # Follow-up LLM calls avoided
+    llm_calls: int = 0                    # Follow-up LLM calls made
+    llm_seconds: float = 0.0              # Time spent in those calls
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def mean_llm_seconds(self) -> float:
+        return self.llm_seconds / self.llm_calls if self.llm_calls else 0.0
+
+    # Estimated time saved: skipped calls at the observed mean follow-up latency
+    @property
+    def saved_seconds(self) -> float:
+        return self.skipped * self.mean_llm_seconds
+
+    def record_check(self, skipped: bool):
+        with self._lock:
+            self.checks += 1
+            self.skipped += int(skipped)
+
+    def record_llm_call(self, seconds: float):
+        with self._lock:
+            self.llm_calls += 1
+            self.llm_seconds += seconds
+
+
+# Process-wide totals across all sessions
+gate_stats = GateStats()
+
+
+# ---- Local check run before generating a follow-up question. A sub-question counts
+# as answered when the answer has evidence for every one of its keywords (the word or
+# a synonym); "name" is also satisfied by a business name being introduced. The answer
+# is complete when at least min_coverage of the sub-questions are answered, it has
+# min_words words and it doesn't hedge ("not sure", "TBD", ...).
+class CompletenessGate:
+    def __init__(self, min_coverage: float = 1.0, min_words: int = 25):
+        self.min_coverage = min_coverage
+        self.min_words = min_words
+
+    def missing(self, question: str, answer: str) -> List[str]:
+        answer_stems = frozenset(stem(w) for w in words(answer))
+        missing = []
+        for sub_question in split_sub_questions(question):
+            keywords = sub_question_keywords(sub_question)
+            if not keywords:
+                continue
+            answered = True
+            for options in keywords:
+                if _mentions(answer_stems, options):
+                    continue
+                if stem("name") in options and _names_business(answer):
+                    continue
+                answered = False
+                break
+            if not answered:
+                missing.append(sub_question)
+        return missing
+
+    def is_complete(self, question: str, answer: str) -> bool:
+        if len(words(answer)) < self.min_words or _hedges(answer):
+            return False
+        sub_questions = [q for q in split_sub_questions(question) if sub_question_keywords(q)]
+        if not sub_questions:
+            return False
+        answered = len(sub_questions) - len(self.missing(question, answer))
+        return answered / len(sub_questions) >= self.min_coverage
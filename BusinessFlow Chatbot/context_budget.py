@@ -0,0 +1,139 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+TRIM_MARKER = " [...]"
+
+
+# Cheap token estimate (~4 characters per token for English with llama-style
+# tokenizers). Good enough for budgeting; swap in a real tokenizer via count_tokens.
+def estimate_tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+
+# Cuts text down to roughly max_tokens, ending on a word boundary
+def trim_to_tokens(text: str, max_tokens: int, count_tokens=estimate_tokens) -> str:
+    if count_tokens(text) <= max_tokens:
+        return text
+    limit = max(max_tokens * 4 - len(TRIM_MARKER), 0)
+    cut = text[:limit]
+    if " " in cut:
+        cut = cut[:cut.rindex(" ")]
+    while cut and count_tokens(cut + TRIM_MARKER) > max_tokens:
+        cut = cut[:-max(len(cut) // 10, 1)]
+    return cut + TRIM_MARKER if cut else ""
+
+
+@dataclass
+class ContextStats:
+    original_tokens: int = 0       # Tokens of the compile prompt built from raw history
+    final_tokens: int = 0          # Tokens of the prompt actually sent
+    budget: int = 0
+    sections_summarized: int = 0
+    sections_trimmed: int = 0
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.original_tokens - self.final_tokens
+
+
+# ---- Keeps the compile-plan prompt within a token budget. Sections that grow past
+# section_tokens are summarized in the background as soon as they are complete,
+# and build() trims whatever is still over budget when the plan is compiled.
+class ContextBudget:
+    def __init__(
+        self,
+        summarize: Optional[Callable[[str, str, int], Awaitable[str]]] = None,
+        max_prompt_tokens: int = 3000,
+        section_tokens: int = 600,
+        count_tokens: Callable[[str], int] = estimate_tokens,
+    ):
+        self.summarize = summarize
+        self.max_prompt_tokens = max_prompt_tokens
+        self.section_tokens = section_tokens
+        self.count_tokens = count_tokens
+        # section -> (history entries the summary was made from, task producing it)
+        self._compactions: Dict[str, Tuple[Tuple[str, ...], asyncio.Task]] = {}
+
+    # Call when a section's Q&A is final; starts a background summary if it is too long
+    def section_completed(self, section: str, entries: List[str]):
+        self.discard(section)
+        text = "\n".join(entries)
+        if self.summarize is None or self.count_tokens(text) <= self.section_tokens:
+            return
+        task = asyncio.create_task(self.summarize(section, text, self.section_tokens))
+        self._compactions[section] = (tuple(entries), task)
+
+    # Drops (and cancels) pending summaries for one section, or all of them
+    def discard(self, section: Optional[str] = None):
+        sections = [section] if section is not None else list(self._compactions)
+        for name in sections:
+            entry = self._compactions.pop(name, None)
+            if entry is not None and not entry[1].done():
+                entry[1].cancel()
+
+    async def _section_text(self, section: str, entries: List[str], stats: ContextStats) -> str:
+        text = "\n".join(entries)
+        entry = self._compactions.get(section)
+        if entry is None or entry[0] != tuple(entries):
+            return text
+        try:
+            summary = (await entry[1]).strip()
+        except asyncio.CancelledError:
+            if not entry[1].cancelled():
+                raise
+            return text
+        except Exception as e:
+            print(f"Summarizing section {section} failed: {e}")
+            return text
+        if summary and self.count_tokens(summary) < self.count_tokens(text):
+            stats.sections_summarized += 1
+            return summary
+        return text
+
+    # Returns the {all_qa} text for template, guaranteed to keep the formatted
+    # prompt within max_prompt_tokens, together with statistics about the savings
+    async def build(self, history: Dict[str, List[str]], template) -> Tuple[str, ContextStats]:
+        stats = ContextStats(budget=self.max_prompt_tokens)
+        raw_qa = "\n\n".join("\n".join(entries) for entries in history.values())
+        stats.original_tokens = self.count_tokens(template.format(all_qa=raw_qa))
+
+        texts = [await self._section_text(section, entries, stats) for section, entries in history.items()]
+
+        overhead = self.count_tokens(template.format(all_qa=""))
+        separators = self.count_tokens("\n\n") * max(len(texts) - 1, 0)
+        available = max(self.max_prompt_tokens - overhead - separators, 0)
+        texts = self._fit(texts, available, stats)
+
+        all_qa = "\n\n".join(texts)
+        if self.count_tokens(template.format(all_qa=all_qa)) > self.max_prompt_tokens:
+            # Estimates don't always add up exactly across joins; clamp the whole block
+            all_qa = trim_to_tokens(all_qa, available, self.count_tokens)
+
+        stats.final_tokens = self.count_tokens(template.format(all_qa=all_qa))
+        self.discard()
+        return all_qa, stats
+
+    # Water-filling: small sections keep their full text, and the remaining budget is
+    # shared evenly between the larger ones, which are trimmed to their share
+    def _fit(self, texts: List[str], available: int, stats: ContextStats) -> List[str]:
+        sizes = [self.count_tokens(t) for t in texts]
+        if sum(sizes) <= available:
+            return texts
+
+        order = sorted(range(len(texts)), key=lambda i: sizes[i])
+        remaining, left = available, len(texts)
+        limits = [0] * len(texts)
+        for i in order:
+            share = remaining // left
+            limits[i] = min(sizes[i], share)
+            remaining -= limits[i]
+            left -= 1
+
+        fitted = []
+        for text, size, limit in zip(texts, sizes, limits):
+            if size > limit:
+                stats.sections_trimmed += 1
+                text = trim_to_tokens(text, limit, self.count_tokens)
+            fitted.append(text)
+        return fitted
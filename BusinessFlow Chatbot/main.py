@@ -1,11 +1,19 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Dict
 from uuid import uuid4
 import asyncio
+import json
+import os
+import sys
+import time
 from fastapi.middleware.cors import CORSMiddleware
 
-from BusinessChatbotEngine import BusinessPlanBuilder, BusinessPlanState
+# Shared helpers (mentor_common/) live in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from BusinessChatbotEngine import BusinessPlanBuilder
+from metrics import registry as metrics_registry, Gauge, HTTP_SECONDS, SESSIONS_STARTED, SESSIONS_ENDED, monitor_event_loop, spans
 
 app = FastAPI()
 app.add_middleware(
@@ -20,38 +28,186 @@ app.add_middleware(
 engine = BusinessPlanBuilder()
 
 # In-memory session store
-sessions: Dict[str, BusinessPlanState] = {}
+sessions: Dict[str, BusinessPlanBuilder] = {}
+
+# Non-interactive /plan builds, kept apart from sessions so /step and /status never
+# accept their ids; only end_session (and so /end and shutdown) sees them
+bulk_runs: Dict[str, BusinessPlanBuilder] = {}
+
+metrics_registry.register(Gauge(
+    "chatbot_active_sessions", "Sessions currently held in memory", callback=lambda: len(sessions)))
+metrics_registry.register(Gauge(
+    "chatbot_active_bulk_plans", "/plan builds running or queued", callback=lambda: len(bulk_runs)))
+
+# How often abandoned sessions are looked for
+REAPER_INTERVAL = 60
+
+# Longest a /start or /status request holds the connection waiting for output;
+# clients follow up with /status if the first question isn't ready yet
+START_WAIT_SECONDS = 30
+MAX_STATUS_WAIT_SECONDS = 60
 
 class UserInput(BaseModel):
     session_id: str
     user_input: str
 
+class SessionId(BaseModel):
+    session_id: str
+
+class FollowupAnswer(BaseModel):
+    question: str                                    # Follow-up question as it was asked
+    answer: str
+
+class BulkPlanRequest(BaseModel):
+    answers: Dict[str, str]                          # Section name -> answer to its question
+    followup_answers: Dict[str, FollowupAnswer] = {} # Section name -> its follow-up question and answer
+    generate_followups: bool = False                 # Generate follow-up questions for the other answered sections
+    stream: bool = False                             # Stream the plan as NDJSON while it is generated
+
+# Upper bound on non-interactive plans compiled at the same time; further requests queue
+BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", "4"))
+bulk_slots = asyncio.Semaphore(BULK_CONCURRENCY)
+
+
+# Cancels a session's (or bulk build's) graph and LLM work and forgets it
+async def end_session(session_id: str, reason: str = "Session ended."):
+    engine = sessions.pop(session_id, None) or bulk_runs.pop(session_id, None)
+    if engine is not None:
+        SESSIONS_ENDED.inc(reason=reason)
+        await engine.cancel(reason)
+
+
+# Ends the session if the HTTP client goes away while its request is still waiting;
+# cancel() wakes up the waiting handler
+async def watch_disconnect(request: Request, session_id: str):
+    while True:
+        await asyncio.sleep(1.0)
+        if await request.is_disconnected():
+            await asyncio.shield(end_session(session_id, "Client disconnected."))
+            return
+
+
+# Periodically ends sessions nobody has talked to for longer than their idle timeout
+# (e.g. the Streamlit tab was closed), in case their graph is stuck somewhere other
+# than waiting for input
+async def reap_idle_sessions():
+    while True:
+        await asyncio.sleep(REAPER_INTERVAL)
+        now = time.monotonic()
+        for session_id, engine in list(sessions.items()):
+            if now - engine.last_active > engine.idle_timeout + REAPER_INTERVAL:
+                await end_session(session_id, "Session ended due to inactivity.")
+
+
+@app.on_event("startup")
+async def startup():
+    app.state.reaper = asyncio.create_task(reap_idle_sessions())
+    app.state.loop_monitor = asyncio.create_task(monitor_event_loop())
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    app.state.reaper.cancel()
+    app.state.loop_monitor.cancel()
+    for session_id in [*sessions, *bulk_runs]:
+        await end_session(session_id, "Server shutting down.")
+
+
+# Times every request by route template (e.g. /status/{session_id}), until the response
+# starts; /step latency is the time to generate the next question. A plain ASGI
+# middleware, unlike @app.middleware("http"), passes the client's disconnect through
+# to request.is_disconnected(), which watch_disconnect relies on.
+class RequestTimer:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        observed = False
+
+        def observe(status):
+            nonlocal observed
+            if not observed:
+                observed = True
+                route = scope.get("route")
+                endpoint = route.path if route is not None else "unmatched"
+                HTTP_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint, status=status)
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start":
+                observe(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            observe(500)
+
+
+app.add_middleware(RequestTimer)
+
+
+# Prometheus scrape endpoint
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
 
 # Ceate instance of AI engine and get the first question
 @app.post("/start")
-async def start():
+async def start(request: Request):
     session_id = str(uuid4())
     engine = BusinessPlanBuilder()
+    engine.session_id = session_id
+    SESSIONS_STARTED.inc(kind="interactive")
 
-    asyncio.create_task(engine.invoke())
+    task = engine.start()
+    # Drop the session once its graph ends (plan compiled, exit, timeout or cancelled)
+    task.add_done_callback(lambda _: sessions.pop(session_id, None))
     sessions[session_id] = engine
     
-    for _ in range(1800):  # wait 3 min max
-        await asyncio.sleep(0.1)
-        if engine.output != "":
-            break
+    watcher = asyncio.create_task(watch_disconnect(request, session_id))
+    try:
+        await engine.wait_for_output(0, timeout=START_WAIT_SECONDS)
+    finally:
+        watcher.cancel()
     
     engine.is_output_ready = False
 
     return {
         "session_id": session_id,
         "output": engine.output,
-        "allow_input": engine.allow_input
+        "allow_input": engine.allow_input,
+        "seq": engine.output_seq,
+    }
+
+# Current output of a session. With wait > 0 this is a long poll: it returns as soon
+# as output newer than `after` (the seq of the last output the client has) is
+# published, or after `wait` seconds (at most MAX_STATUS_WAIT_SECONDS) with the output
+# unchanged. Unlike /step, a dropped poll does not end the session.
+@app.get("/status/{session_id}")
+async def status(session_id: str, after: int = -1, wait: float = 0.0):
+    if session_id not in sessions:
+        return {"error": "Invalid session_id"}
+
+    engine = sessions[session_id]
+    if wait > 0 and engine.output_seq <= after:
+        await engine.wait_for_output(after, timeout=min(wait, MAX_STATUS_WAIT_SECONDS))
+
+    return {
+        "session_id": session_id,
+        "output": engine.output,
+        "allow_input": engine.allow_input,
+        "seq": engine.output_seq,
+        "done": engine.graph_task is None or engine.graph_task.done(),
     }
 
 # Process user input and gets the next question after generation
 @app.post("/step")
-async def step(user_input: UserInput):
+async def step(user_input: UserInput, request: Request):
     session_id = user_input.session_id
     user_text = user_input.user_input
 
@@ -61,31 +217,106 @@ async def step(user_input: UserInput):
     engine = sessions[session_id]
 
     await engine.set_user_input(user_text)
-    
-    async with engine.input_processed_condition:
-        try:
-            await asyncio.wait_for(
-                engine.input_processed_condition.wait(),
-                timeout=3600.0 * 6 # 6 hours
-            )
-        except asyncio.TimeoutError:
-            pass
-
-    if not engine.is_output_ready:
-        async with engine.output_ready_condition:
+    watcher = asyncio.create_task(watch_disconnect(request, session_id))
+    wall, start = time.time(), time.perf_counter()
+
+    try:
+        async with engine.input_processed_condition:
             try:
                 await asyncio.wait_for(
-                    engine.output_ready_condition.wait(),
-                    timeout=600.0 # 10 min
+                    engine.input_processed_condition.wait(),
+                    timeout=3600.0 * 6 # 6 hours
                 )
             except asyncio.TimeoutError:
                 pass
 
+        if not engine.is_output_ready and not engine.cancelled:
+            async with engine.output_ready_condition:
+                try:
+                    await asyncio.wait_for(
+                        engine.output_ready_condition.wait(),
+                        timeout=600.0 # 10 min
+                    )
+                except asyncio.TimeoutError:
+                    pass
+    finally:
+        watcher.cancel()
+        spans.log("turn", wall, time.perf_counter() - start, session_id=session_id, turn=engine.turn, cancelled=engine.cancelled)
+
     return {
         "output": engine.output,
         "allow_input": engine.allow_input
     }
 
+# Builds a complete plan from answers supplied up front, without the /start -> /step dialogue
+@app.post("/plan")
+async def plan(body: BulkPlanRequest, request: Request):
+    engine = BusinessPlanBuilder()
+    unknown = (set(body.answers) | set(body.followup_answers)) - set(engine.SECTIONS)
+    if unknown:
+        return {"error": f"Unknown sections: {', '.join(sorted(unknown))}", "sections": engine.SECTIONS}
+    for text in list(body.answers.values()) + [f.answer for f in body.followup_answers.values()]:
+        if text.strip().lower() in ["exit", "back", "restart"]:
+            return {"error": "Answers cannot be control commands (exit, back, restart)."}
+
+    session_id = str(uuid4())
+    engine.session_id = session_id
+    followups = {section: (f.question, f.answer) for section, f in body.followup_answers.items()}
+    bulk_runs[session_id] = engine
+    SESSIONS_STARTED.inc(kind="bulk")
+
+    async def build(plan_stream=None):
+        try:
+            async with bulk_slots:
+                # Time spent queued for a slot doesn't count as idle
+                engine.last_active = time.monotonic()
+                return await engine.build_plan(
+                    body.answers, followups, body.generate_followups, plan_stream
+                )
+        finally:
+            bulk_runs.pop(session_id, None)
+
+    if not body.stream:
+        watcher = asyncio.create_task(watch_disconnect(request, session_id))
+        try:
+            result = await build()
+        except asyncio.CancelledError:
+            return {"error": "Plan generation was cancelled."}
+        finally:
+            watcher.cancel()
+        return {"session_id": session_id, **result}
+
+    # Streaming: one JSON object per line, {"delta": ...} chunks of the plan followed by a final summary
+    async def events():
+        queue = asyncio.Queue()
+        task = asyncio.create_task(build(queue))
+        task.add_done_callback(lambda _: queue.put_nowait(None))
+        try:
+            while (delta := await queue.get()) is not None:
+                yield json.dumps({"delta": delta}) + "\n"
+            result = await task
+            result.pop("plan")
+            yield json.dumps({"done": True, "session_id": session_id, **result}) + "\n"
+        except asyncio.CancelledError:
+            yield json.dumps({"error": "Plan generation was cancelled."}) + "\n"
+        except Exception as e:
+            yield json.dumps({"error": f"Plan generation failed: {e}"}) + "\n"
+        finally:
+            # Client went away mid-stream: stop generating
+            if not task.done():
+                await end_session(session_id, "Client disconnected.")
+                task.cancel()
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+# Ends a session early (e.g. the user restarted in the frontend) and frees its resources
+@app.post("/end")
+async def end(session: SessionId):
+    if session.session_id not in sessions and session.session_id not in bulk_runs:
+        return {"error": "Invalid session_id"}
+    await end_session(session.session_id)
+    return {"ended": True}
+
 
 
-# uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=1)
+# uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=1)
\ No newline at end of file
@@ -0,0 +1,229 @@
+import asyncio
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+from completeness import gate_stats
+from semantic_cache import followup_cache
+
+# Minimal Prometheus-compatible metrics: counters, gauges and histograms kept in
+# plain dicts behind one lock, rendered in the text exposition format for /metrics.
+# Recording a sample is a dict update, so it is cheap enough to leave on.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Tuple, extra: Tuple = ()) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> Tuple:
+        return tuple(labels.get(n, "") for n in self.labelnames)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+
+
+# Counters and gauges share storage; callback, if given, is evaluated at scrape time
+# instead of storing values (for totals kept elsewhere, e.g. completeness.gate_stats)
+class _Scalar(_Metric):
+    def __init__(self, *args, callback: Optional[Callable[[], float]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.callback = callback
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        yield from super().render()
+        if self.callback is not None:
+            yield f"{self.name} {self.callback()}"
+            return
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+
+
+class Counter(_Scalar):
+    kind = "counter"
+
+
+class Gauge(_Scalar):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Tuple, list] = {}     # key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                entry[index] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def render(self):
+        yield from super().render()
+        with self._lock:
+            items = [(key, list(entry)) for key, entry in self._values.items()]
+        for key, entry in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, (('le', bound),))} {cumulative}"
+            yield f"{self.name}_bucket{_format_labels(self.labelnames, key, (('le', '+Inf'),))} {entry[-1]}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {entry[-2]}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {entry[-1]}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(line for metric in self.metrics for line in metric.render()) + "\n"
+
+
+registry = Registry()
+
+# ---- Metrics recorded by the engine and the API
+NODE_SECONDS = registry.register(Histogram(
+    "chatbot_node_duration_seconds", "Time spent in each graph node, excluding time waiting for the user", ["node"]))
+LLM_SECONDS = registry.register(Histogram(
+    "chatbot_llm_request_duration_seconds", "LLM request latency", ["node", "model"]))
+LLM_TOKENS = registry.register(Counter(
+    "chatbot_llm_tokens_total", "Tokens processed by LLM requests", ["node", "model", "direction"]))
+LLM_ERRORS = registry.register(Counter(
+    "chatbot_llm_errors_total", "LLM requests that failed or were cancelled", ["node", "model", "reason"]))
+THINK_SECONDS = registry.register(Histogram(
+    "chatbot_user_think_seconds", "Time between a question being shown and the user's answer",
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)))
+HTTP_SECONDS = registry.register(Histogram(
+    "chatbot_http_request_duration_seconds", "HTTP handler latency until the response starts", ["endpoint", "status"]))
+SESSIONS_STARTED = registry.register(Counter(
+    "chatbot_sessions_started_total", "Sessions started", ["kind"]))
+SESSIONS_ENDED = registry.register(Counter(
+    "chatbot_sessions_ended_total", "Sessions ended early, by reason", ["reason"]))
+PROMPT_TOKENS_SAVED = registry.register(Counter(
+    "chatbot_compile_prompt_tokens_saved_total", "Tokens removed from compile prompts by context budgeting"))
+FOLLOWUPS_SKIPPED = registry.register(Counter(
+    "chatbot_followups_skipped_total", "Follow-up LLM calls skipped by the completeness gate",
+    callback=lambda: gate_stats.skipped))
+FOLLOWUP_SECONDS_SAVED = registry.register(Gauge(
+    "chatbot_followup_seconds_saved", "Estimated LLM time saved by the completeness gate",
+    callback=lambda: round(gate_stats.saved_seconds, 3)))
+CACHE_LOOKUPS = registry.register(Counter(
+    "chatbot_followup_cache_lookups_total", "Follow-up semantic cache lookups",
+    callback=lambda: followup_cache.stats.lookups))
+CACHE_HITS = registry.register(Counter(
+    "chatbot_followup_cache_hits_total", "Follow-up questions served from the semantic cache",
+    callback=lambda: followup_cache.stats.hits))
+CACHE_ENTRIES = registry.register(Gauge(
+    "chatbot_followup_cache_entries", "Follow-up questions held in the semantic cache",
+    callback=lambda: len(followup_cache)))
+CACHE_SECONDS_SAVED = registry.register(Gauge(
+    "chatbot_followup_cache_seconds_saved", "Estimated LLM time saved by the follow-up semantic cache",
+    callback=lambda: round(followup_cache.stats.saved_seconds, 3)))
+LOOP_LAG = registry.register(Histogram(
+    "chatbot_event_loop_lag_seconds", "How late the event loop ran a periodic timer",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)))
+
+
+# (input, output) token counts reported by Ollama for a LangChain message, if any
+def token_usage(message) -> Optional[Tuple[int, int]]:
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    metadata = getattr(message, "response_metadata", None) or {}
+    if "prompt_eval_count" in metadata or "eval_count" in metadata:
+        return metadata.get("prompt_eval_count", 0), metadata.get("eval_count", 0)
+    return None
+
+
+def record_tokens(node: str, model: str, usage: Optional[Tuple[int, int]]):
+    if usage:
+        LLM_TOKENS.inc(usage[0], node=node, model=model, direction="input")
+        LLM_TOKENS.inc(usage[1], node=node, model=model, direction="output")
+
+
+# Measures event loop lag: how much later than scheduled a sleep wakes up
+async def monitor_event_loop(interval: float = 0.5):
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        LOOP_LAG.observe(max(loop.time() - start - interval, 0.0))
+
+
+# ---- Optional span log: one JSON object per line per timed operation, tagged with
+# the session and turn, written to the file named by CHATBOT_SPAN_LOG
+class SpanLogger:
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", buffering=1) if path else None
+
+    @property
+    def enabled(self) -> bool:
+        return self._file is not None
+
+    def log(self, name: str, start: float, duration: float, **attrs):
+        if self._file is None:
+            return
+        record = {"name": name, "start": round(start, 6), "duration_ms": round(duration * 1000, 3), **attrs}
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        wall, start = time.time(), time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            self.log(name, wall, time.perf_counter() - start, **attrs)
+
+
+spans = SpanLogger(os.getenv("CHATBOT_SPAN_LOG"))
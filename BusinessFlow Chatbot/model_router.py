@@ -0,0 +1,45 @@
+import json
+import threading
+from typing import Dict, Tuple
+
+from mentor_common.llm_pool import PooledChatOllama
+
+DEFAULT_MODEL = {"model": "llama3.1", "options": {"temperature": 0}}
+
+# Clients shared by every session in the process, one per (model, options) pair.
+# Each routes its requests across the Ollama servers listed in OLLAMA_URLS.
+_clients: Dict[Tuple[str, str], PooledChatOllama] = {}
+_clients_lock = threading.Lock()
+
+
+def get_chat_model(model: str, options: dict) -> PooledChatOllama:
+    # Options may hold lists (e.g. stop: ["\n"]), so they are keyed by their JSON form
+    key = (model, json.dumps(options, sort_keys=True, default=str))
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = PooledChatOllama(model, **options)
+        return _clients[key]
+
+
+# ---- Picks the model and generation options for each graph node from the
+# settings.models block of prompts.yaml, e.g. a small quantized model for
+# "Ask Followup Question" and the full model for "Compile Plan". Nodes without
+# an entry use settings.models.default.
+class ModelRouter:
+    def __init__(self, settings: dict):
+        models = settings.get("models") or {}
+        default = models.get("default") or {}
+        self.default = {
+            "model": default.get("model", DEFAULT_MODEL["model"]),
+            "options": dict(default.get("options", DEFAULT_MODEL["options"])),
+        }
+        self.nodes = models.get("nodes") or {}
+
+    # (model name, options) for a node; node options extend the default options
+    def spec(self, node: str) -> Tuple[str, dict]:
+        entry = self.nodes.get(node) or {}
+        options = {**self.default["options"], **(entry.get("options") or {})}
+        return entry.get("model", self.default["model"]), options
+
+    def llm(self, node: str = "default") -> PooledChatOllama:
+        return get_chat_model(*self.spec(node))
@@ -0,0 +1,98 @@
+import time
+from typing import List, Optional
+
+from mentor_common.llm_pool import BackendPool, default_pool
+
+
+# ---- Follow-up generation that lets Ollama reuse its KV cache across turns.
+# split_prefix: the template's static prefix is sent as an identical system prompt
+#   on every call, so any server slot that has seen it can skip prefilling it.
+# carry_context: each turn also continues from the token context returned by the
+#   session's previous turn, so only the new question/response is prefilled. This
+#   pays off when the server has at least as many slots (OLLAMA_NUM_PARALLEL) as
+#   concurrently active sessions; otherwise sessions evict each other's context.
+# keep_alive keeps the model resident between turns. Requests go through the
+# shared BackendPool (OLLAMA_URLS); the session sticks to the server it used last
+# while that server is healthy and not much busier than the rest, since that is
+# where its prefix is cached.
+class OllamaPrefixSession:
+    def __init__(
+        self,
+        model: str,
+        template,                       # prompt_registry.PromptTemplate
+        base_url: Optional[str] = None,     # Single server instead of the shared pool
+        keep_alive: str = "30m",
+        options: Optional[dict] = None,
+        max_context_tokens: int = 4096,
+        split_prefix: bool = False,
+        carry_context: bool = True,
+        pool: Optional[BackendPool] = None,
+    ):
+        self.model = model
+        self.template = template
+        self.pool = pool or (BackendPool([base_url]) if base_url else default_pool())
+        self.backend_url = None             # Server that handled the last turn
+        self.keep_alive = keep_alive
+        self.options = options or {}
+        self.max_context_tokens = max_context_tokens
+        self.split_prefix = split_prefix
+        self.carry_context = carry_context
+
+        self.context: Optional[List[int]] = None
+        # Running totals for this session, reported by the benchmark and logs
+        self.calls = 0
+        self.prefill_tokens = 0
+        self.ttft_seconds: List[float] = []
+        self.last_usage = (0, 0)            # (input, output) tokens of the latest call
+
+    # Forget the conversation so the next turn starts from the bare prefix again
+    def reset(self):
+        self.context = None
+
+    def _payload(self, **values) -> dict:
+        payload = {
+            "model": self.model,
+            "stream": True,
+            "keep_alive": self.keep_alive,
+            "options": self.options,
+        }
+        if self.carry_context and self.context:
+            payload["prompt"] = self.template.body.format(**values)
+            payload["context"] = self.context
+        elif self.split_prefix:
+            payload["system"] = self.template.prefix
+            payload["prompt"] = self.template.body.format(**values)
+        else:
+            payload["prompt"] = self.template.format(**values)
+        return payload
+
+    def _on_backend(self, backend):
+        self.backend_url = backend.url
+
+    async def generate(self, **values) -> str:
+        start = time.perf_counter()
+        first_token_at = None
+        parts = []
+        final = {}
+
+        async for chunk in self.pool.stream(
+            "/api/generate", self._payload(**values), model=self.model, prefer=self.backend_url, on_backend=self._on_backend
+        ):
+            if chunk.get("response"):
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                parts.append(chunk["response"])
+            if chunk.get("done"):
+                final = chunk
+
+        self.calls += 1
+        self.prefill_tokens += final.get("prompt_eval_count", 0)
+        self.last_usage = (final.get("prompt_eval_count", 0), final.get("eval_count", 0))
+        self.ttft_seconds.append((first_token_at or time.perf_counter()) - start)
+
+        if self.carry_context:
+            context = final.get("context")
+            # Start over from the prefix once the conversation gets too long to be worth carrying
+            self.context = context if context and len(context) <= self.max_context_tokens else None
+
+        return "".join(parts)
@@ -0,0 +1,221 @@
+import copy
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from string import Formatter
+from typing import Dict, Optional, Tuple
+
+import yaml
+
+try:
+    import fcntl
+except ImportError:                     # Windows: saves from different processes are not serialized
+    fcntl = None
+
+# Placeholders each template must contain, and the only ones it may contain
+TEMPLATE_FIELDS = {
+    "followup_prompt": {"question", "response"},
+    "compile_plan_prompt": {"all_qa"},
+}
+
+# Same, for templates that may be left out of prompts.yaml
+OPTIONAL_TEMPLATE_FIELDS = {
+    "summarize_prompt": {"section", "qa", "max_words"},
+}
+
+
+class PromptValidationError(ValueError):
+    pass
+
+
+class PromptVersionConflict(RuntimeError):
+    pass
+
+
+# Where the static part of a format string ends: the start of the line holding the
+# first "{field}", so labels like "Question: {question}" stay with their value
+def _static_prefix_end(text: str) -> int:
+    i = 0
+    while i < len(text):
+        if text[i:i + 2] in ("{{", "}}"):
+            i += 2
+        elif text[i] == "{":
+            return text.rfind("\n", 0, i) + 1
+        else:
+            i += 1
+    return len(text)
+
+
+# ---- A prompt template parsed once: placeholders are validated up front and the
+# static text before the first placeholder is kept separately so it can be sent
+# as a stable, cacheable prefix (see ollama_session.py)
+class PromptTemplate:
+    def __init__(self, name: str, text: str):
+        self.name = name
+        self.text = text
+        try:
+            parts = list(Formatter().parse(text))
+        except ValueError as e:
+            raise PromptValidationError(f"{name}: {e}") from e
+
+        self.fields = {field for _, field, _, _ in parts if field is not None}
+
+        split = _static_prefix_end(text)
+        self.prefix = text[:split].format()   # Static text, braces unescaped
+        self.body = text[split:]              # Remainder, still a format string
+
+    def format(self, **values) -> str:
+        return self.text.format(**values)
+
+
+# ---- Immutable view of one version of prompts.yaml; sessions hold on to the
+# snapshot they started with so hot reloads never change a running conversation
+@dataclass(frozen=True)
+class PromptSnapshot:
+    version: int
+    data: dict                       # Full parsed file (treat as read-only)
+    sections: Tuple[str, ...]        # Ordered section names
+    questions: Dict[str, str]        # Section name -> initial question
+    templates: Dict[str, PromptTemplate]
+
+    @property
+    def customs(self) -> dict:
+        return self.data.get("customs", {})
+
+    @property
+    def settings(self) -> dict:
+        return self.data.get("settings") or {}
+
+    # Deep copy for callers that want to edit and save (e.g. the admin panel)
+    def editable(self) -> dict:
+        return copy.deepcopy(self.data)
+
+
+def _build_snapshot(data: dict) -> PromptSnapshot:
+    if not isinstance(data, dict) or not isinstance(data.get("customs"), dict):
+        raise PromptValidationError("prompts file must contain a 'customs' mapping")
+    customs = data["customs"]
+
+    templates = {}
+    for key, allowed in {**TEMPLATE_FIELDS, **OPTIONAL_TEMPLATE_FIELDS}.items():
+        if key in OPTIONAL_TEMPLATE_FIELDS and not customs.get(key):
+            continue
+        template = PromptTemplate(key, customs.get(key) or "")
+        missing = allowed - template.fields
+        unknown = template.fields - allowed
+        if missing:
+            raise PromptValidationError(f"{key} must include " + ", ".join(f"{{{f}}}" for f in sorted(missing)))
+        if unknown:
+            raise PromptValidationError(f"{key} has unknown placeholders: " + ", ".join(f"{{{f}}}" for f in sorted(unknown)))
+        templates[key] = template
+
+    sections = customs.get("sections") or []
+    if not sections or not all(isinstance(s, dict) and s.get("name") and "prompt" in s for s in sections):
+        raise PromptValidationError("customs.sections must be a non-empty list of {name, prompt} entries")
+
+    return PromptSnapshot(
+        version=int(data.get("version", 0)),
+        data=data,
+        sections=tuple(s["name"] for s in sections),
+        questions={s["name"]: s["prompt"] for s in sections},
+        templates=templates,
+    )
+
+
+# ---- Parses prompts.yaml once per process, hot-reloads it when its mtime
+# changes and saves new versions atomically
+class PromptRegistry:
+    def __init__(self, path: str = "prompts.yaml", check_interval: float = 1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._snapshot: Optional[PromptSnapshot] = None
+        self._mtime = None
+        self._last_check = 0.0
+
+    # Latest valid snapshot; stats the file at most once per check_interval
+    def current(self) -> PromptSnapshot:
+        now = time.monotonic()
+        if self._snapshot is not None and now - self._last_check < self.check_interval:
+            return self._snapshot
+
+        with self._lock:
+            self._last_check = now
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                if self._snapshot is None:
+                    raise
+                return self._snapshot
+            if self._snapshot is None or mtime != self._mtime:
+                self._load(mtime)
+            return self._snapshot
+
+    def _load(self, mtime):
+        try:
+            with open(self.path, "r") as f:
+                data = yaml.safe_load(f)
+            snapshot = _build_snapshot(data)
+        except (yaml.YAMLError, PromptValidationError) as e:
+            # Keep serving the last good version if an edit on disk is invalid
+            self.last_error = str(e)
+            if self._snapshot is None:
+                raise
+            print(f"Ignoring invalid prompts file {self.path}: {e}")
+            return
+        self._snapshot = snapshot
+        self._mtime = mtime
+        self.last_error = None
+
+    # Validates and writes a new version. If expected_version is given and the file
+    # has moved on since the caller loaded it, PromptVersionConflict is raised. The
+    # check and the write hold a lock file next to prompts.yaml, so saves from the
+    # backend and Streamlit processes can't both pass the check and overwrite each other.
+    def save(self, data: dict, expected_version: Optional[int] = None) -> PromptSnapshot:
+        self.current()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        lock_path = os.path.join(directory, f".{os.path.basename(self.path)}.lock")
+
+        with self._lock, open(lock_path, "w") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # Another process may have saved since the last check: read the file again
+            if os.path.exists(self.path):
+                self._load(os.stat(self.path).st_mtime_ns)
+            current = self._snapshot
+
+            if expected_version is not None and expected_version != current.version:
+                raise PromptVersionConflict(
+                    f"prompts were changed elsewhere (version {current.version}, expected {expected_version})"
+                )
+            data = copy.deepcopy(data)
+            data["version"] = current.version + 1
+            snapshot = _build_snapshot(data)
+
+            # Write to a temp file in the same directory, then atomically swap it in
+            fd, tmp_path = tempfile.mkstemp(prefix=".prompts-", suffix=".yaml", dir=directory)
+            try:
+                if os.path.exists(self.path):
+                    os.chmod(tmp_path, os.stat(self.path).st_mode & 0o777)
+                with os.fdopen(fd, "w") as f:
+                    yaml.safe_dump(data, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+            self._snapshot = snapshot
+            self._mtime = os.stat(self.path).st_mtime_ns
+            self._last_check = time.monotonic()
+            self.last_error = None
+            return snapshot
+
+
+# Shared per-process registry used by both the engine and the Streamlit frontend
+registry = PromptRegistry()
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+DIMENSIONS = 1 << 20
+
+
+# ---- Local embedding: hashed word unigrams and bigrams with sublinear term
+# frequency, L2-normalized, as a sparse {bucket: weight} dict. Cheap and dependency
+# free; it matches answers that say nearly the same thing in nearly the same words,
+# which is what near-duplicate first answers look like.
+def embed(text: str) -> Dict[int, float]:
+    tokens = re.findall(r"[a-z0-9]+", text.lower())
+    features = Counter(tokens)
+    features.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    vector: Dict[int, float] = {}
+    for feature, count in features.items():
+        bucket = zlib.crc32(feature.encode("utf-8")) % DIMENSIONS
+        vector[bucket] = vector.get(bucket, 0.0) + 1.0 + math.log(count)
+    norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+    return {bucket: w / norm for bucket, w in vector.items()}
+
+
+def cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(w * b.get(bucket, 0.0) for bucket, w in a.items())
+
+
+# Identifies everything that shapes a follow-up question besides the answer itself
+def fingerprint(template_text: str, model: str, options: dict) -> str:
+    payload = json.dumps([template_text, model, options], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass
+class CacheStats:
+    lookups: int = 0
+    hits: int = 0
+    invalidations: int = 0
+    evictions: int = 0
+    lookup_seconds: float = 0.0           # Time spent searching the cache
+    llm_calls: int = 0                    # Misses that went on to call the LLM
+    llm_seconds: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    # Estimated time saved: hits at the observed mean follow-up latency, minus lookup time
+    @property
+    def saved_seconds(self) -> float:
+        mean_llm = self.llm_seconds / self.llm_calls if self.llm_calls else 0.0
+        return max(self.hits * mean_llm - self.lookup_seconds, 0.0)
+
+
+@dataclass
+class _Entry:
+    vector: Dict[int, float]
+    followup: str
+    hits: int = 0
+
+
+# ---- Bounded cache of generated follow-up questions, looked up by similarity of
+# the first answer. Entries are grouped by section question; the whole cache is
+# cleared when a newer prompts.yaml version changes the follow-up fingerprint
+# (followup_prompt, model or options), and sessions still pinned to an older version
+# bypass it. The least recently used entries are evicted beyond max_entries.
+class SemanticCache:
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Tuple[str, int], _Entry]" = OrderedDict()
+        self.buckets: Dict[str, Dict[int, _Entry]] = {}     # Section question -> entries
+        self.version = -1
+        self.fingerprint = None
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.buckets.clear()
+
+    # True if the caller's prompt version/fingerprint is current (adopting it if newer)
+    def _accepts(self, version: int, fingerprint: str) -> bool:
+        if fingerprint == self.fingerprint:
+            return True
+        if version < self.version:
+            return False
+        if self.fingerprint is not None:
+            self.entries.clear()
+            self.buckets.clear()
+            self.stats.invalidations += 1
+        self.version, self.fingerprint = version, fingerprint
+        return True
+
+    def lookup(self, version: int, fingerprint: str, question: str, answer: str,
+               threshold: float) -> Tuple[Optional[str], Dict[int, float]]:
+        start = time.perf_counter()
+        vector = embed(answer)
+        best, best_score = None, threshold
+        with self._lock:
+            if self._accepts(version, fingerprint):
+                for entry_id, entry in self.buckets.get(question, {}).items():
+                    score = cosine(vector, entry.vector)
+                    if score >= best_score:
+                        best, best_score = (question, entry_id), score
+                if best is not None:
+                    entry = self.entries[best]
+                    entry.hits += 1
+                    self.entries.move_to_end(best)
+            self.stats.lookups += 1
+            self.stats.hits += best is not None
+            self.stats.lookup_seconds += time.perf_counter() - start
+            return (self.entries[best].followup if best is not None else None), vector
+
+    def store(self, version: int, fingerprint: str, question: str, vector: Dict[int, float],
+              followup: str, llm_seconds: float):
+        with self._lock:
+            self.stats.llm_calls += 1
+            self.stats.llm_seconds += llm_seconds
+            if not followup or not self._accepts(version, fingerprint):
+                return
+            key = (question, self._next_id)
+            self._next_id += 1
+            entry = _Entry(vector, followup)
+            self.entries[key] = entry
+            self.buckets.setdefault(question, {})[key[1]] = entry
+            while len(self.entries) > self.max_entries:
+                (old_question, old_id), _ = self.entries.popitem(last=False)
+                bucket = self.buckets[old_question]
+                del bucket[old_id]
+                if not bucket:
+                    del self.buckets[old_question]
+                self.stats.evictions += 1
+
+
+# Process-wide cache shared by every session
+followup_cache = SemanticCache()
@@ -1,100 +1,83 @@
+import os
+import sys
 import streamlit as st
-import requests
-import yaml
-from pathlib import Path
-import subprocess
-import time
+from prompt_registry import registry, PromptValidationError, PromptVersionConflict
+from api_client import ChatbotClient, ChatbotAPIError
+
+# Shared helpers (mentor_common/) live in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mentor_common import get_capabilities
 
 st.set_page_config(layout="wide")
 
-API_URL = "http://localhost:8000"
-
-# -------------------- GPU CHECK --------------------
-def gpu_check():
-    try:
-        output = subprocess.check_output("nvidia-smi", shell=True).decode("utf-8")
-        
-        if "No devices were found" in output:
-            st.error("🚫 No GPU detected.")
-            # st.stop()
-        elif "%" in output:
-            if "show_gpu_success" not in st.session_state:
-                st.session_state.show_gpu_success = True
-                st.rerun()
-            elif st.session_state.show_gpu_success:
-                st.success("✅ GPU check passed.")
-                time.sleep(1)
-                st.session_state.show_gpu_success = False
-        else:
-            st.warning("⚠️ GPU detected but not in use.")
-            # st.stop()
-    except subprocess.CalledProcessError:
-        st.error("❌ Could not check GPU.")
-        # st.stop()
+# One pooled backend client per Streamlit process, shared across reruns and users
+@st.cache_resource
+def get_client():
+    return ChatbotClient()
 
-gpu_check()
+client = get_client()
 
 # -------------------- PROMPT MANAGEMENT --------------------
-PROMPT_FILE = Path("prompts.yaml")
-
+# prompts.yaml is parsed once per process by the shared registry and only
+# re-read when the file changes, so reruns don't re-parse it
 def load_prompts():
-    with open(PROMPT_FILE, "r") as f:
-        raw = yaml.safe_load(f)
-
-    customs = raw.get("customs", {})
-    custom_sections = {s["name"]: s["prompt"] for s in customs.get("sections", [])}
+    snapshot = registry.current()
+    customs = snapshot.customs
 
     prompts = {
         "followup_prompt": customs.get("followup_prompt", ""),
         "compile_plan_prompt": customs.get("compile_plan_prompt", ""),
-        "sections": list(custom_sections.keys()),
-        "section_prompts": custom_sections
+        "sections": list(snapshot.sections),
+        "section_prompts": dict(snapshot.questions)
     }
 
-    return prompts, raw
+    return prompts, snapshot.editable(), snapshot.version
 
-def save_prompts(data):
-    with open(PROMPT_FILE, "w") as f:
-        yaml.safe_dump(data, f)
+# Atomic write; fails if someone else saved a newer version in the meantime
+def save_prompts(data, expected_version):
+    return registry.save(data, expected_version=expected_version)
 
-PROMPTS, RAW_PROMPT_DATA = load_prompts()
+PROMPTS, RAW_PROMPT_DATA, PROMPT_VERSION = load_prompts()
 SECTIONS = PROMPTS["sections"]
 
+# -------------------- CAPABILITY CHECK --------------------
+# Every model named in settings.models of prompts.yaml
+def required_models(settings):
+    models = settings.get("models") or {}
+    names = {(models.get("default") or {}).get("model", "llama3.1")}
+    names.update(node["model"] for node in (models.get("nodes") or {}).values() if node and node.get("model"))
+    return tuple(sorted(names))
+
+# GPU, Ollama and model availability, probed once per process in the background
+# (refreshed every few minutes); never delays the page
+def show_capabilities():
+    capabilities = get_capabilities(required_models(registry.current().settings))
+    if not capabilities.ready:
+        st.sidebar.caption("Checking GPU and Ollama...")
+        return
+    if capabilities.gpu:
+        st.sidebar.caption(f"✅ GPU mode ({capabilities.gpu_name})")
+    else:
+        st.sidebar.caption("⚠️ No GPU detected: CPU mode, responses will be slower.")
+        for note in capabilities.accelerator_notes:
+            st.sidebar.caption(note)
+    for problem in capabilities.problems:
+        st.sidebar.error(problem)
+
+st.sidebar.image("charlotte_white_logo.png", width=160)
+show_capabilities()
+
 # -------------------- SESSION STATE --------------------
 def init_state():
     if "session_id" not in st.session_state:
         try:
-            res = requests.post(f"{API_URL}/start")
-            res.raise_for_status()
-            data = res.json()
+            # Creates one backend session and long-polls /status until its first question is ready
+            data = client.start_session()
 
             session_id = data.get("session_id")
             output = data.get("output", "")
             allow_input = data.get("allow_input", False)
 
-            if not session_id:
-                st.error("⚠️ Failed to get a valid session ID from backend.")
-                st.stop()
-
-            # Wait and keep polling if output isn't ready yet
-            max_wait_seconds = 20
-            poll_interval = 0.5
-            waited = 0
-
-            while not output and waited < max_wait_seconds:
-                time.sleep(poll_interval)
-                waited += poll_interval
-
-                # Try polling again (you could also create a dedicated `/status` endpoint for robustness)
-                res = requests.post(f"{API_URL}/start")
-                res.raise_for_status()
-                data = res.json()
-                output = data.get("output", "")
-
-            if not output:
-                st.error("⚠️ Backend timed out waiting for initial output.")
-                st.stop()
-
             st.session_state.session_id = session_id
             st.session_state.history = [("assistant", output)]
             st.session_state.allow_input = allow_input
@@ -111,7 +94,6 @@ def init_state():
 init_state()
 
 # -------------------- USER PAGE --------------------
-st.sidebar.image("charlotte_white_logo.png", width=160)
 page = st.sidebar.radio("Navigate", ["User", "Admin"])
 
 if page == "User":
@@ -146,8 +128,10 @@ if page == "User":
         with st.chat_message(role):
             st.markdown(content)
 
-    # Handle restart
+    # Handle restart: end the old backend session so its work is cancelled, then start fresh
     if st.session_state.get("restart_requested", False):
+        if st.session_state.get("session_id"):
+            client.end(st.session_state.session_id)
         for k in list(st.session_state.keys()):
             del st.session_state[k]
         st.rerun()
@@ -170,13 +154,13 @@ if page == "User":
     # Handle awaiting LLM reply
     if st.session_state.awaiting_llm and not st.session_state.finished:
         with st.spinner("⏳ Generating..."):
-            payload = {
-                "session_id": st.session_state.session_id,
-                "user_input": st.session_state.user_input
-            }
-            res = requests.post(f"{API_URL}/step", json=payload)
-            res.raise_for_status()
-            data = res.json()
+            try:
+                data = client.step(st.session_state.session_id, st.session_state.user_input)
+            except ChatbotAPIError as e:
+                st.error(f"❌ {e} Type **restart** to start a new session.")
+                st.session_state.awaiting_llm = False
+                st.session_state.allow_input = True
+                st.stop()
 
             output = data["output"]
             st.session_state.allow_input = data["allow_input"]
@@ -218,6 +202,13 @@ if page == "Admin":
     customs = RAW_PROMPT_DATA.get("customs", {})
     defaults = RAW_PROMPT_DATA.get("defaults", {})
 
+    # Edit buffers are seeded from prompts.yaml once and kept across reruns, so the
+    # version they were seeded from is kept with them; saving checks it is still current
+    def reset_prompt_editor():
+        for key in [k for k in st.session_state if k in ("followup_prompt", "compile_plan_prompt", "prompt_version")
+                    or k.startswith("section_prompt_")]:
+            del st.session_state[key]
+
     # ---------- FOLLOW-UP PROMPT ----------
     st.markdown("### 🔁 Question Follow-Up Prompt")
     st.markdown("Must include `{question}` and `{response}`.\n")
@@ -227,6 +218,7 @@ if page == "Admin":
 
     if "followup_prompt" not in st.session_state:
         st.session_state["followup_prompt"] = followup_custom
+        st.session_state["prompt_version"] = PROMPT_VERSION
 
     if st.session_state.get("reset_followup_flag"):
         st.session_state["followup_prompt"] = followup_default
@@ -325,6 +317,10 @@ if page == "Admin":
         })
 
     # ---------- SAVE CHANGES ----------
+    if st.button("🔄 Discard Changes and Reload"):
+        reset_prompt_editor()
+        st.rerun()
+
     if st.button("💾 Save Changes"):
         errors = []
 
@@ -340,5 +336,12 @@ if page == "Admin":
             RAW_PROMPT_DATA["customs"]["followup_prompt"] = st.session_state["followup_prompt"]
             RAW_PROMPT_DATA["customs"]["compile_plan_prompt"] = st.session_state["compile_plan_prompt"]
             RAW_PROMPT_DATA["customs"]["sections"] = updated_sections
-            save_prompts(RAW_PROMPT_DATA)
-            st.success("✅ Custom prompts saved successfully.")
\ No newline at end of file
+            try:
+                snapshot = save_prompts(RAW_PROMPT_DATA, st.session_state.get("prompt_version", PROMPT_VERSION))
+                reset_prompt_editor()
+                st.success(f"✅ Custom prompts saved successfully (version {snapshot.version}).")
+            except PromptVersionConflict:
+                st.error("❌ Prompts were changed by someone else since you started editing. Copy your edits, "
+                         "press **Discard Changes and Reload** and re-apply them.")
+            except PromptValidationError as e:
+                st.error(f"❌ {e}")
\ No newline at end of file
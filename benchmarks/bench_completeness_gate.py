@@ -0,0 +1,107 @@
+# Accuracy of the completeness gate (BusinessFlow Chatbot/completeness.py) on sample
+# first answers for each section of prompts.yaml. A non-answer or partial answer that
+# passes means the user silently misses a follow-up question, so any of those fails
+# the run; complete answers that still get a follow-up only cost an LLM call and are
+# reported as the skip rate. Exits non-zero if any non-answer passes.
+#
+#   python benchmarks/bench_completeness_gate.py
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "BusinessFlow Chatbot"))
+
+from completeness import CompletenessGate  # noqa: E402
+
+QUESTIONS = {
+    "Company Description": "Describe your business. What is its name, what problem does it solve, and what makes it unique?",
+    "Market Analysis": "Who is your target audience, and who are your main competitors?",
+    "Organization and Management": "What is your business structure, and who are the key members of your team?",
+    "Service or Product Line": "What products or services do you offer, and how do they benefit customers?",
+}
+
+COMPLETE = {
+    "Company Description": [
+        "We are Brightly, a scheduling app for small landscaping companies. Crews waste hours every week "
+        "because jobs are planned on paper, and that is the problem we solve by automating routes and invoices. "
+        "Unlike generic tools, our proprietary routing engine is built for seasonal outdoor work.",
+        "Acme Health is a telehealth service for rural clinics. The main issue is the lack of specialists within "
+        "driving distance, and we address it with video visits booked through the clinic. What makes us different "
+        "is a patented low-bandwidth video codec that works on slow rural connections.",
+    ],
+    "Market Analysis": [
+        "Our target audience is independent landscaping companies with two to twenty employees, mostly owner-operated "
+        "customers in suburban markets. Our main competitors are Jobber and Yardbook, plus spreadsheets, which remain "
+        "the most common alternative.",
+    ],
+    "Organization and Management": [
+        "Brightly is an LLC owned by its two founders. The team is Maria Lopez, our CEO, who ran a landscaping "
+        "company for ten years, and Dev Patel, our CTO, previously an engineer at a logistics startup. We plan to hire "
+        "a sales manager next year.",
+    ],
+    "Service or Product Line": [
+        "We offer a mobile app and web platform sold as a monthly subscription, with scheduling, routing and invoicing. "
+        "Customers save around six hours a week on planning, get paid faster because invoices go out the same day, "
+        "and reduce fuel costs through shorter routes.",
+    ],
+}
+
+# Answers that must still get a follow-up question
+INCOMPLETE = {
+    "Company Description": [
+        "I am not sure yet, I still need to think about it. Maybe we will help someone first, we want to be better "
+        "than others and the only one doing it. Talk to John about this later please, he knows more than me.",
+        "It's a startup idea that I have been working on for a while with some friends from college, and we think "
+        "it could be really big one day if everything goes well and we find the right people to help us out.",
+        "We are Brightly, a scheduling app for landscaping companies. We have been working on it for about a year "
+        "with a small group of friends, and we are excited to launch it next spring in our home town.",
+    ],
+    "Market Analysis": [
+        "Honestly we haven't decided who exactly we are going after, probably a lot of different people. There are "
+        "some other companies out there but I don't know their names, we will look into that soon enough.",
+        "Our target audience is independent landscaping companies with two to twenty employees, mostly owner-operated "
+        "businesses in suburban areas across the midwest who currently do their planning on paper.",
+    ],
+    "Organization and Management": [
+        "Right now it is just me and a friend working on this in the evenings after work. We will sort out the legal "
+        "stuff and figure out who does what once we get some money in, it is still pretty early for us.",
+    ],
+    "Service or Product Line": [
+        "We are still working out the details of what exactly we are going to sell, it depends on what people want. "
+        "Anything that helps people and is useful, we're open to ideas at this point, nothing is fixed yet.",
+        "It is really good and people will love it, it will change the way everyone works and everyone we talked to "
+        "thought it was a great idea that they would want to use every day once it is ready for them.",
+    ],
+}
+
+
+def main():
+    gate = CompletenessGate(min_coverage=1.0, min_words=25)
+    ok = True
+    skipped = total = 0
+    start = time.perf_counter()
+    for section, answers in COMPLETE.items():
+        for answer in answers:
+            total += 1
+            missing = gate.missing(QUESTIONS[section], answer)
+            if gate.is_complete(QUESTIONS[section], answer):
+                skipped += 1
+            else:
+                print(f"follow-up  {section}: still missing {missing}")
+    for section, answers in INCOMPLETE.items():
+        for answer in answers:
+            if gate.is_complete(QUESTIONS[section], answer):
+                print(f"FAIL       {section}: non-answer passed: {answer[:70]!r}...")
+                ok = False
+    checks = total + sum(len(a) for a in INCOMPLETE.values())
+    elapsed_ms = (time.perf_counter() - start) / checks * 1000
+
+    incomplete = sum(len(a) for a in INCOMPLETE.values())
+    print(f"\ncomplete answers skipped: {skipped}/{total}; non-answers passed: "
+          f"{'none' if ok else 'some'} of {incomplete}; {elapsed_ms:.2f} ms per check")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
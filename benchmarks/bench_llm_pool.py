@@ -0,0 +1,91 @@
+# Throughput of the shared LLM backend pool (mentor_common/llm_pool.py) against 1, 2
+# and 4 local stub servers that each handle one request at a time, plus a failover
+# run where one server goes down halfway through. Exits non-zero if throughput does
+# not scale with the pool size or a request is lost during failover.
+#
+#   python benchmarks/bench_llm_pool.py [requests] [concurrency]
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+from mentor_common.llm_pool import BackendPool, PooledChatOllama  # noqa: E402
+from stub_ollama import StubOllama  # noqa: E402
+
+PROMPT = "Describe the business in one sentence. " * 20
+
+
+async def run_async(pool, requests, concurrency):
+    llm = PooledChatOllama("llama3.1", pool=pool, temperature=0)
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with slots:
+            return await llm.ainvoke(PROMPT)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one() for _ in range(requests)), return_exceptions=True)
+    return time.perf_counter() - start, [r for r in results if isinstance(r, Exception)]
+
+
+# Same through the blocking invoke() used by the autopopulation app
+def run_threads(pool, requests, concurrency):
+    llm = PooledChatOllama("llama3.1", pool=pool, temperature=0)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(lambda _: llm.invoke(PROMPT), range(requests)))
+    return time.perf_counter() - start
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 48
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    stubs = [StubOllama(prefill_ms_per_token=0.2, gen_ms_per_token=5, gen_tokens=20).start() for _ in range(4)]
+    ok = True
+    try:
+        print(f"{requests} requests, {concurrency} concurrent, stub servers handle one request at a time\n")
+        print(f"{'servers':>8} {'async req/s':>12} {'threaded req/s':>15} {'per server':>20}")
+        baseline = None
+        for size in (1, 2, 4):
+            for stub in stubs:
+                stub.requests = 0
+            pool = BackendPool([stub.url for stub in stubs[:size]])
+            elapsed, errors = asyncio.run(run_async(pool, requests, concurrency))
+            threaded = run_threads(pool, requests, concurrency)
+            rate = requests / elapsed
+            baseline = baseline or rate
+            spread = "/".join(str(stub.requests) for stub in stubs[:size])
+            print(f"{size:>8} {rate:>12.1f} {requests / threaded:>15.1f} {spread:>20}"
+                  f"   x{rate / baseline:.1f}{'  errors: %d' % len(errors) if errors else ''}")
+            ok &= not errors
+        ok &= rate >= baseline * 2.5
+
+        # Failover: one of three servers stops answering while requests are in flight
+        pool = BackendPool([stub.url for stub in stubs[:3]], health_interval=0.5)
+
+        async def failover():
+            run = asyncio.create_task(run_async(pool, requests, concurrency))
+            await asyncio.sleep(0.3)
+            stubs[0].down = True
+            return await run
+
+        elapsed, errors = asyncio.run(failover())
+        stats = {s["url"][-5:]: (s["healthy"], s["requests"], s["failures"]) for s in pool.stats()}
+        print(f"\nfailover: {requests} requests in {elapsed:.2f}s, {len(errors)} lost; "
+              f"(healthy, requests, failures) per server: {stats}")
+        ok &= not errors and not pool.stats()[0]["healthy"]
+    finally:
+        for stub in stubs:
+            stub.stop()
+
+    print("\nOK" if ok else "\nFAILED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# Memory and cold-load time of the NLI model (Application Autopopulation Bot/
+# nli_loader.py) across several worker processes, loaded the old way ("copy": each
+# process reads its own weights through pipeline(...)) and from the memory-mapped
+# safetensors export ("mmap"). All workers of a mode stay alive together so their
+# resident (RSS), proportional (PSS) and shared memory can be compared. Exits
+# non-zero if the two modes classify differently or mmap workers share no weights.
+#
+#   python benchmarks/bench_nli_mmap.py [workers] [model]
+#
+# model defaults to facebook/bart-large-mnli (downloaded on first use); a local
+# checkpoint directory also works. Set NLI_WEIGHTS_DIR to keep the export elsewhere.
+import json
+import os
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP = os.path.join(HERE, "..", "Application Autopopulation Bot")
+sys.path.insert(0, APP)
+
+CHUNK = "Acme sells widgets to plumbers in Ohio."
+DESCRIPTION = "Acme is a company that sells widgets to plumbers."
+
+
+# One worker process: load, classify once, report; then report memory again when asked
+def worker(mode, model):
+    start = time.perf_counter()
+    import nli_loader
+
+    nli = nli_loader.get_nli_pipeline(model, device=-1, mode=mode)
+    seconds = time.perf_counter() - start
+    info = nli_loader.load_info()
+    result = nli(CHUNK, [DESCRIPTION], hypothesis_template="This text is true: {}")
+    print(json.dumps({"seconds": seconds, "mode": info["mode"], "error": info["error"],
+                      "score": result["scores"][0]}), flush=True)
+    sys.stdin.readline()
+    print(json.dumps(nli_loader.memory_report(info["path"])), flush=True)
+    sys.stdin.readline()
+
+
+def run_mode(mode, model, workers):
+    # Started one after another so load times are not inflated by contention
+    procs, loads = [], []
+    for _ in range(workers):
+        proc = subprocess.Popen([sys.executable, __file__, "--worker", mode, model],
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        procs.append(proc)
+        loads.append(json.loads(proc.stdout.readline()))
+    reports = []
+    for proc in procs:
+        proc.stdin.write("\n")
+        proc.stdin.flush()
+        reports.append(json.loads(proc.stdout.readline()))
+    for proc in procs:
+        proc.stdin.write("\n")
+        proc.stdin.close()
+        proc.wait()
+    return loads, reports
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    import nli_loader
+
+    model = sys.argv[2] if len(sys.argv) > 2 else nli_loader.NLI_MODEL
+    start = time.perf_counter()
+    exported = nli_loader.export_weights(model)
+    if exported:
+        print(f"one-time safetensors export: {time.perf_counter() - start:.1f}s -> {nli_loader.export_dir(model)}\n")
+
+    results = {mode: run_mode(mode, model, workers) for mode in ("copy", "mmap")}
+    print(f"{workers} workers, {model}\n")
+    print(f"{'mode':>5} {'worker':>6} {'load s':>7} {'RSS MB':>8} {'PSS MB':>8} {'shared MB':>10} {'weights shared MB':>18}")
+    for mode, (loads, reports) in results.items():
+        for i, (load, report) in enumerate(zip(loads, reports)):
+            print(f"{mode:>5} {i:>6} {load['seconds']:>7.2f} {report['rss_mb']:>8} {report['pss_mb']:>8} "
+                  f"{report['shared_mb']:>10} {report.get('weights_shared_mb', '-'):>18}")
+
+    ok = True
+    copy_loads, copy_reports = results["copy"]
+    mmap_loads, mmap_reports = results["mmap"]
+    if any(load["mode"] != "mmap" for load in mmap_loads):
+        print(f"\nFAIL mmap mode fell back to copy: {mmap_loads[0]['error']}")
+        ok = False
+    if any(abs(a["score"] - b["score"]) > 1e-5 for a, b in zip(copy_loads, mmap_loads)):
+        print("\nFAIL mmap and copy workers classify differently")
+        ok = False
+    if workers > 1 and ok and mmap_reports[-1].get("weights_shared_mb", 0) <= 0:
+        print("\nFAIL mmap workers do not share weight pages")
+        ok = False
+
+    mean = lambda values: sum(values) / len(values)
+    pss = lambda reports: sum(r["pss_mb"] for r in reports)
+    print(f"\ncold load: copy {mean([l['seconds'] for l in copy_loads]):.2f}s, "
+          f"mmap {mean([l['seconds'] for l in mmap_loads]):.2f}s per worker")
+    print(f"total PSS of all workers: copy {pss(copy_reports):.0f} MB, mmap {pss(mmap_reports):.0f} MB")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--worker"]:
+        worker(sys.argv[2], sys.argv[3])
+    else:
+        main()
@@ -0,0 +1,46 @@
+# Benchmarks PDF export for large answer sets: cold build, cached lookup and
+# streaming to a file, with peak Python memory for each.
+#
+#   python benchmarks/bench_pdf_export.py [num_answers] [words_per_answer]
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Application Autopopulation Bot"))
+
+from pdf_export import PDFExportCache, write_pdf  # noqa: E402
+
+
+def measure(label, fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {elapsed * 1000:>10.1f} ms   peak {peak / 1e6:>8.1f} MB")
+    return result
+
+
+def main():
+    num_answers = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    words = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+
+    questions = [f"Question {i}: what does the company do about topic {i}?" for i in range(num_answers)]
+    answers = [" ".join(["Résumé naïve café growth"] * (words // 4)) for _ in range(num_answers)]
+    print(f"{num_answers} answers x {words} words")
+
+    cache = PDFExportCache()
+    content = measure("cold build (bytes)", lambda: cache.get(questions, answers))
+    measure("cached lookup", lambda: cache.get(questions, answers))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.pdf")
+        measure("stream to file", lambda: write_pdf(questions, answers, path))
+        print(f"pdf size: {len(content) / 1e6:.2f} MB (file {os.path.getsize(path) / 1e6:.2f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# Compares follow-up generation modes of OllamaPrefixSession against the local
+# stub server, reporting prefill tokens and time-to-first-token:
+#   original        full prompt on every call with the original followup_prompt,
+#                   whose instructions came after {question}/{response}
+#   stateless       full formatted prompt on every call
+#   stable prefix   static instructions sent as an identical system prompt
+#   prefix+context  additionally continue from the session's previous context
+# Each is run with as many server slots as sessions, and with fewer.
+#
+#   python benchmarks/bench_prefix_cache.py [sessions] [sections]
+import asyncio
+import os
+import statistics
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(0, os.path.join(HERE, "..", "BusinessFlow Chatbot"))
+
+from ollama_session import OllamaPrefixSession  # noqa: E402
+from prompt_registry import PromptRegistry, PromptTemplate  # noqa: E402
+from stub_ollama import StubOllama  # noqa: E402
+
+ORIGINAL_TEMPLATE = PromptTemplate("followup_prompt", (
+    "Analyze this business plan response and identify any missing details:\n\n"
+    "Question: {question}\nResponse: {response}\n\n"
+    "Create a follow-up question to fill any gaps and complete incomplete responses if the response "
+    "does not answer all questions asked. Do not call it the follow-up question, mention \"follow-up "
+    "question\" at all, or use any kind of qualifiers or titles to label it as something similar. "
+    "Only ask the question directly.\n"
+))
+
+MODES = {
+    "original": dict(split_prefix=False, carry_context=False),
+    "stateless": dict(split_prefix=False, carry_context=False),
+    "stable prefix": dict(split_prefix=True, carry_context=False),
+    "prefix+context": dict(split_prefix=True, carry_context=True),
+}
+
+
+async def run(stub, template, sessions, sections, mode):
+    runners = [OllamaPrefixSession("llama3.1", template, base_url=stub.url, **mode) for _ in range(sessions)]
+
+    async def session(runner, index):
+        for section in range(sections):
+            answer = f"Session {index} answer for section {section}: we help small clinics reduce no-shows. " * 3
+            await runner.generate(question=f"Question {section}?", response=answer)
+
+    await asyncio.gather(*(session(r, i) for i, r in enumerate(runners)))
+    ttft = [t for r in runners for t in r.ttft_seconds]
+    return sum(r.prefill_tokens for r in runners), statistics.mean(ttft)
+
+
+def main():
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    sections = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    template = PromptRegistry(os.path.join(HERE, "..", "BusinessFlow Chatbot", "prompts.yaml")).current().templates["followup_prompt"]
+
+    print(f"{sessions} sessions x {sections} follow-ups")
+    for slots in (sessions, max(sessions // 4, 1)):
+        print(f"-- server slots: {slots}")
+        for label, mode in MODES.items():
+            with StubOllama(prefill_ms_per_token=0.5, gen_ms_per_token=2, slots=slots) as stub:
+                used = ORIGINAL_TEMPLATE if label == "original" else template
+                prefill, ttft = asyncio.run(run(stub, used, sessions, sections, mode))
+            print(f"{label:<16} prefill tokens {prefill:>7}   mean ttft {ttft * 1000:>7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
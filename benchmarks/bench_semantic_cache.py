@@ -0,0 +1,87 @@
+# Behaviour and lookup cost of the follow-up semantic cache (BusinessFlow Chatbot/
+# semantic_cache.py): near-duplicate first answers must hit, different answers must
+# miss, a new follow-up prompt must invalidate the cache, and it must stay within
+# max_entries. Reports hit rate, lookup latency with a full cache and estimated
+# savings. Exits non-zero if any check fails.
+#
+#   python benchmarks/bench_semantic_cache.py [entries]
+import os
+import random
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "BusinessFlow Chatbot"))
+
+from semantic_cache import SemanticCache, fingerprint  # noqa: E402
+
+QUESTION = "What is the name of your business, what problem does it solve, and what makes it unique?"
+ANSWER = ("We are BrightPath, a mobile app that helps small landscaping companies schedule crews "
+          "and invoice customers. Most of them still use paper and spreadsheets.")
+NEAR_DUPLICATES = [
+    ANSWER.replace("We are", "We're"),
+    ANSWER.replace("Most of them", "Most of these companies"),
+    ANSWER + " ",
+    ANSWER.lower(),
+]
+DIFFERENT = [
+    "Our bakery sells gluten-free bread to cafes downtown.",
+    "BrightPath is a nonprofit that tutors high school students in math.",
+    "We make invoicing software for dentists; nobody else integrates with their X-ray systems.",
+]
+WORDS = ("customers market pricing subscription app service delivery local online platform "
+         "team funding growth revenue partners cost quality support software retail").split()
+THRESHOLD = 0.92
+LLM_SECONDS = 1.5               # Typical follow-up latency on CPU, for the savings estimate
+
+
+def main():
+    entries = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    random.seed(0)
+    ok = True
+
+    def check(condition, message):
+        nonlocal ok
+        print(f"{'ok  ' if condition else 'FAIL'} {message}")
+        ok = ok and condition
+
+    v1 = fingerprint("Ask a follow-up about {question}: {response}", "llama3.2:3b", {"num_predict": 128})
+    cache = SemanticCache(max_entries=entries)
+    _, vector = cache.lookup(1, v1, QUESTION, ANSWER, THRESHOLD)
+    cache.store(1, v1, QUESTION, vector, "Who are your first customers?", LLM_SECONDS)
+
+    hits = sum(cache.lookup(1, v1, QUESTION, text, THRESHOLD)[0] is not None for text in NEAR_DUPLICATES)
+    check(hits == len(NEAR_DUPLICATES), f"near-duplicate answers hit ({hits}/{len(NEAR_DUPLICATES)})")
+    misses = sum(cache.lookup(1, v1, QUESTION, text, THRESHOLD)[0] is None for text in DIFFERENT)
+    check(misses == len(DIFFERENT), f"different answers miss ({misses}/{len(DIFFERENT)})")
+    check(cache.lookup(1, v1, "Who are your competitors?", ANSWER, THRESHOLD)[0] is None,
+          "same answer to another section misses")
+
+    v2 = fingerprint("Ask one short follow-up about {question}: {response}", "llama3.2:3b", {"num_predict": 128})
+    check(cache.lookup(2, v2, QUESTION, ANSWER, THRESHOLD)[0] is None and len(cache) == 0,
+          "new follow-up prompt invalidates the cache")
+    check(cache.lookup(1, v1, QUESTION, ANSWER, THRESHOLD)[0] is None and cache.fingerprint == v2,
+          "sessions on the old prompt version bypass it")
+
+    # Fill past capacity with random answers, then time lookups against a full section
+    for i in range(entries + entries // 2):
+        text = " ".join(random.choices(WORDS, k=40))
+        _, vector = cache.lookup(2, v2, QUESTION, text, THRESHOLD)
+        cache.store(2, v2, QUESTION, vector, f"Follow-up {i}?", LLM_SECONDS)
+    check(len(cache) == entries, f"bounded at max_entries ({len(cache)} entries, {cache.stats.evictions} evicted)")
+
+    rounds = 200
+    start = time.perf_counter()
+    for _ in range(rounds):
+        cache.lookup(2, v2, QUESTION, ANSWER, THRESHOLD)
+    lookup_ms = (time.perf_counter() - start) / rounds * 1000
+    check(lookup_ms < LLM_SECONDS * 1000 / 10, f"lookup with {len(cache)} entries: {lookup_ms:.2f} ms")
+
+    stats = cache.stats
+    print(f"\nlookups {stats.lookups}, hits {stats.hits} ({stats.hit_rate:.1%}), "
+          f"invalidations {stats.invalidations}, est. saved {stats.saved_seconds:.1f}s")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+# Minimal stand-in for an Ollama server, for benchmarks only. It imitates the
+# parts that matter for performance work: prefill time proportional to the prompt
+# tokens that are not already in a KV-cache slot, a fixed per-token generation
+# time, and one request at a time per server (like a single GPU). Setting
+# `down` makes it drop every connection without answering, like a crashed server.
+#
+# Implements /api/generate and /api/chat (streaming and non-streaming) and /api/tags.
+import json
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def tokenize(text):
+    return [zlib.crc32(word.encode("utf-8")) & 0xFFFFFF for word in re.findall(r"\S+", text or "")]
+
+
+def common_prefix(a, b):
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+class _Server(ThreadingHTTPServer):
+    request_queue_size = 128            # Accept bursts of concurrent clients instead of resetting them
+
+
+class StubOllama:
+    def __init__(self, prefill_ms_per_token=0.5, gen_ms_per_token=5.0, gen_tokens=20,
+                 slots=4, parallel=1, models=("llama3.1",), port=0):
+        self.prefill = prefill_ms_per_token / 1000
+        self.gen = gen_ms_per_token / 1000
+        self.gen_tokens = gen_tokens
+        self.models = list(models)
+        self.max_slots = slots
+        self.slots = []                       # Cached token sequences, most recently used last
+        self.lock = threading.Lock()
+        self.busy = threading.Semaphore(parallel)
+        self.requests = 0
+        self.prefill_tokens = 0
+        self.down = False
+        self.server = _Server(("127.0.0.1", port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # Prefill cost only for tokens after the longest cached prefix. Like Ollama's
+    # runner, a request that only shares part of another slot's history gets that
+    # prefix copied into the least recently used slot instead of truncating it.
+    def _prefill(self, tokens):
+        with self.lock:
+            best = max(range(len(self.slots)), key=lambda i: common_prefix(self.slots[i], tokens), default=None)
+            cached = common_prefix(self.slots[best], tokens) if best is not None else 0
+            if best is not None and cached < len(self.slots[best]):
+                best = None
+            self.requests += 1
+            self.prefill_tokens += len(tokens) - cached
+        time.sleep((len(tokens) - cached) * self.prefill)
+        return len(tokens) - cached, best
+
+    def _remember(self, tokens, slot):
+        with self.lock:
+            if slot is not None:
+                self.slots.pop(slot)
+            elif len(self.slots) >= self.max_slots:
+                self.slots.pop(0)
+            self.slots.append(tokens)
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, body, status=200):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _drop_if_down(self):
+                if stub.down:
+                    self.close_connection = True
+                return stub.down
+
+            def do_GET(self):
+                if self._drop_if_down():
+                    return
+                if self.path in ("/", "/api/tags", "/api/version"):
+                    self._send_json({"models": [{"name": f"{m}:latest", "model": f"{m}:latest"} for m in stub.models]})
+                else:
+                    self._send_json({"error": "not found"}, 404)
+
+            def do_HEAD(self):
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                req = json.loads(self.rfile.read(length) or b"{}")
+                if self._drop_if_down():
+                    return
+                if self.path == "/api/generate":
+                    tokens = list(req.get("context") or []) + (
+                        [] if req.get("context") else tokenize(req.get("system"))
+                    ) + tokenize(req.get("prompt"))
+                    self._generate(req, tokens, chat=False)
+                elif self.path == "/api/chat":
+                    text = "\n".join(m.get("content", "") for m in req.get("messages", []))
+                    self._generate(req, tokenize(text), chat=True)
+                else:
+                    self._send_json({"error": "not found"}, 404)
+
+            def _generate(self, req, tokens, chat):
+                stream = req.get("stream", True)
+                with stub.busy:
+                    start = time.perf_counter()
+                    evaluated, slot = stub._prefill(tokens)
+                    words = [f"tok{i} " for i in range(stub.gen_tokens)]
+                    output = tokens + tokenize("".join(words))
+                    stub._remember(output, slot)
+
+                    def chunk(text, done):
+                        body = {"model": req.get("model"), "done": done}
+                        if chat:
+                            body["message"] = {"role": "assistant", "content": text}
+                        else:
+                            body["response"] = text
+                        if done:
+                            body.update(
+                                prompt_eval_count=evaluated,
+                                eval_count=len(words),
+                                total_duration=int((time.perf_counter() - start) * 1e9),
+                                done_reason="stop",
+                            )
+                            if not chat:
+                                body["context"] = output
+                        return body
+
+                    if not stream:
+                        time.sleep(stub.gen * len(words))
+                        self._send_json(chunk("".join(words), True))
+                        return
+
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/x-ndjson")
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    for word in words:
+                        time.sleep(stub.gen)
+                        self._write_chunk(chunk(word, False))
+                    self._write_chunk(chunk("", True))
+                    self.wfile.write(b"0\r\n\r\n")
+
+            def _write_chunk(self, body):
+                data = (json.dumps(body) + "\n").encode()
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+if __name__ == "__main__":
+    with StubOllama(port=11434) as stub:
+        print(f"Stub Ollama listening on {stub.url} (ctrl+c to stop)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
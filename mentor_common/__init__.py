@@ -0,0 +1,2 @@
+from .capabilities import Capabilities, CapabilityProbe, get_capabilities, ensure_nltk_data, probe
+from .llm_pool import BackendPool, PooledChatOllama, NoBackendAvailable, default_pool
@@ -0,0 +1,208 @@
+import importlib.util
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, Optional, Sequence, Tuple
+
+# First server of the LLM pool (see llm_pool.py)
+OLLAMA_BASE_URL = (os.getenv("OLLAMA_URLS") or os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")).split(",")[0].strip()
+
+PROBE_TIMEOUT = 5               # Seconds allowed for each external check (nvidia-smi, Ollama)
+DEFAULT_TTL = 300               # Seconds a probe result is reused before it is refreshed
+
+
+# ---- What this machine can run, as seen by one probe
+@dataclass(frozen=True)
+class Capabilities:
+    accelerator: str = "unknown"                 # "cuda", "mps", "cpu" or "unknown" while the first probe runs
+    gpu_name: Optional[str] = None
+    ollama_url: str = OLLAMA_BASE_URL
+    ollama_reachable: Optional[bool] = None
+    models: Tuple[str, ...] = ()                 # Models installed in Ollama
+    missing_models: Tuple[str, ...] = ()         # Required models that are not installed
+    nltk_data: Dict[str, bool] = field(default_factory=dict)
+    problems: Tuple[str, ...] = ()               # Human-readable reasons a check failed
+    accelerator_notes: Tuple[str, ...] = ()      # Why no GPU was found (e.g. nvidia-smi errors); not a problem on CPU-only machines
+    probed_at: float = 0.0
+    probe_seconds: float = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return self.probed_at > 0
+
+    @property
+    def gpu(self) -> bool:
+        return self.accelerator in ("cuda", "mps")
+
+    # "gpu" or "cpu", for display. Pick a framework's device from its own runtime (e.g.
+    # torch.cuda.is_available()): nvidia-smi seeing a GPU doesn't mean that build can use it
+    @property
+    def mode(self) -> str:
+        return "gpu" if self.gpu else "cpu"
+
+    def has_model(self, name: str) -> bool:
+        return _model_installed(name, self.models)
+
+
+def _model_installed(name: str, installed: Sequence[str]) -> bool:
+    return name in installed or (":" not in name and f"{name}:latest" in installed)
+
+
+# Uses nvidia-smi without a shell, falling back to torch only if the app already imported it
+def _probe_accelerator(notes: list) -> Tuple[str, Optional[str]]:
+    nvidia_smi = shutil.which("nvidia-smi")
+    if nvidia_smi:
+        try:
+            output = subprocess.run(
+                [nvidia_smi, "--query-gpu=name", "--format=csv,noheader"],
+                capture_output=True, text=True, timeout=PROBE_TIMEOUT, check=True,
+            ).stdout.strip()
+            if output:
+                return "cuda", output.splitlines()[0].strip()
+            notes.append("nvidia-smi found no GPU.")
+        except (subprocess.SubprocessError, OSError) as e:
+            notes.append(f"nvidia-smi failed: {e}")
+
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        if torch.cuda.is_available():
+            return "cuda", torch.cuda.get_device_name(0)
+        mps = getattr(torch.backends, "mps", None)
+        if mps is not None and mps.is_available():
+            return "mps", "Apple GPU"
+    return "cpu", None
+
+
+def _probe_ollama(base_url: str, required_models: Sequence[str], problems: list):
+    try:
+        with urllib.request.urlopen(f"{base_url.rstrip('/')}/api/tags", timeout=PROBE_TIMEOUT) as response:
+            tags = json.load(response)
+    except (OSError, ValueError) as e:
+        problems.append(f"Ollama is not reachable at {base_url}: {e}")
+        return False, (), ()
+    models = tuple(m.get("name", "") for m in tags.get("models", []))
+    missing = tuple(m for m in required_models if not _model_installed(m, models))
+    if missing:
+        problems.append(f"Ollama models not installed: {', '.join(missing)} (run `ollama pull <model>`).")
+    return True, models, missing
+
+
+def _probe_nltk(resources: Sequence[str], problems: list) -> Dict[str, bool]:
+    if not resources:
+        return {}
+    if importlib.util.find_spec("nltk") is None:
+        problems.append("NLTK is not installed.")
+        return {resource: False for resource in resources}
+    import nltk
+
+    found = {}
+    for resource in resources:
+        try:
+            nltk.data.find(resource)
+            found[resource] = True
+        except LookupError:
+            found[resource] = False
+            problems.append(f"NLTK data missing: {resource}.")
+    return found
+
+
+def probe(required_models: Sequence[str] = (), nltk_resources: Sequence[str] = (),
+          ollama_url: str = OLLAMA_BASE_URL) -> Capabilities:
+    start = time.perf_counter()
+    problems, notes = [], []
+    accelerator, gpu_name = _probe_accelerator(notes)
+    reachable, models, missing = _probe_ollama(ollama_url, required_models, problems)
+    nltk_data = _probe_nltk(nltk_resources, problems)
+    return Capabilities(
+        accelerator=accelerator,
+        gpu_name=gpu_name,
+        ollama_url=ollama_url,
+        ollama_reachable=reachable,
+        models=models,
+        missing_models=missing,
+        nltk_data=nltk_data,
+        problems=tuple(problems),
+        accelerator_notes=tuple(notes),
+        probed_at=time.time(),
+        probe_seconds=time.perf_counter() - start,
+    )
+
+
+# ---- Runs probe() in a background thread and caches the result for ttl seconds.
+# get() never waits longer than asked: it returns the cached result (refreshing it in
+# the background once stale), or a not-ready Capabilities() before the first probe ends.
+class CapabilityProbe:
+    def __init__(self, required_models: Sequence[str] = (), nltk_resources: Sequence[str] = (),
+                 ttl: float = DEFAULT_TTL, ollama_url: str = OLLAMA_BASE_URL):
+        self.required_models = tuple(required_models)
+        self.nltk_resources = tuple(nltk_resources)
+        self.ttl = ttl
+        self.ollama_url = ollama_url
+        self._result: Optional[Capabilities] = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._refreshing = False
+
+    def _run(self):
+        try:
+            result = probe(self.required_models, self.nltk_resources, self.ollama_url)
+        except Exception as e:           # A failed probe must not take the app down
+            result = Capabilities(accelerator="cpu", problems=(f"Capability probe failed: {e}",), probed_at=time.time())
+        with self._lock:
+            self._result = result
+            self._refreshing = False
+        self._done.set()
+
+    def refresh(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._run, name="capability-probe", daemon=True).start()
+
+    def get(self, wait: float = 0.0) -> Capabilities:
+        with self._lock:
+            result = self._result
+        if result is None or time.time() - result.probed_at > self.ttl:
+            self.refresh()
+        if result is None and wait > 0:
+            self._done.wait(wait)
+            with self._lock:
+                result = self._result
+        return result or Capabilities(ollama_url=self.ollama_url)
+
+
+_probes: Dict[Tuple, CapabilityProbe] = {}
+_probes_lock = threading.Lock()
+
+
+# Shared per-process probe for a given set of requirements; safe to call on every Streamlit rerun
+def get_capabilities(required_models: Sequence[str] = (), nltk_resources: Sequence[str] = (),
+                     wait: float = 0.0, ttl: float = DEFAULT_TTL) -> Capabilities:
+    key = (tuple(required_models), tuple(nltk_resources))
+    with _probes_lock:
+        if key not in _probes:
+            _probes[key] = CapabilityProbe(required_models, nltk_resources, ttl)
+        capability_probe = _probes[key]
+    return capability_probe.get(wait)
+
+
+# Downloads NLTK resources (e.g. "tokenizers/punkt_tab") only if they are missing, once per process
+@lru_cache(maxsize=None)
+def ensure_nltk_data(*resources: str) -> bool:
+    import nltk
+
+    ok = True
+    for resource in resources:
+        try:
+            nltk.data.find(resource)
+        except LookupError:
+            ok = nltk.download(resource.split("/")[-1], quiet=True) and ok
+    return ok
@@ -0,0 +1,289 @@
+import asyncio
+import json
+import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Sequence
+
+import httpx
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+# Comma-separated list of Ollama servers, e.g. "http://gpu1:11434,http://gpu2:11434".
+# Falls back to OLLAMA_BASE_URL, then the default local server.
+OLLAMA_URLS = os.getenv("OLLAMA_URLS") or os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+
+HEALTH_INTERVAL = 10            # Seconds between background health checks
+HEALTH_TIMEOUT = 2.0
+REQUEST_TIMEOUT = httpx.Timeout(600.0, connect=5.0)
+POOL_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=16)
+
+# Generation options that Ollama expects at the top level of the request instead of in "options"
+TOP_LEVEL_OPTIONS = ("keep_alive", "format")
+
+
+class NoBackendAvailable(RuntimeError):
+    pass
+
+
+# Errors worth retrying on another server: connection problems and server-side failures
+class BackendError(RuntimeError):
+    pass
+
+
+class Backend:
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.outstanding = 0            # Requests in flight
+        self.healthy = True             # Optimistic until a check or request fails
+        self.models: Optional[frozenset] = None
+        self.requests = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+    def serves(self, model: Optional[str]) -> bool:
+        if model is None or self.models is None:
+            return True
+        return model in self.models or (":" not in model and f"{model}:latest" in self.models)
+
+    def __repr__(self):
+        return f"Backend({self.url!r}, outstanding={self.outstanding}, healthy={self.healthy})"
+
+
+# ---- A set of Ollama servers serving the same models. Each request goes to the
+# healthy server with the fewest requests in flight (optionally preferring the one a
+# session used last, so its prompt cache is reused); a server that fails a request or
+# a health check is skipped until a later check finds it up again. HTTP connections
+# are pooled and kept alive per process (sync) and per event loop (async).
+class BackendPool:
+    def __init__(self, urls: Sequence[str], health_interval: float = HEALTH_INTERVAL):
+        if not urls:
+            raise ValueError("BackendPool needs at least one server URL")
+        self.backends = [Backend(url) for url in urls]
+        self.health_interval = health_interval
+        self._lock = threading.Lock()
+        self._next = 0                  # Rotates ties between equally loaded servers
+        self._health_thread = None
+        self._sync_client = None
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def from_env(cls, urls: str = OLLAMA_URLS) -> "BackendPool":
+        return cls([url.strip() for url in urls.split(",") if url.strip()])
+
+    # ---- Health checks
+    def check_health(self):
+        for backend in self.backends:
+            try:
+                response = self.sync_client().get(f"{backend.url}/api/tags", timeout=HEALTH_TIMEOUT)
+                response.raise_for_status()
+                models = frozenset(m.get("name", "") for m in response.json().get("models", []))
+                with self._lock:
+                    backend.healthy, backend.models, backend.last_error = True, models, None
+            except (httpx.HTTPError, ValueError) as e:
+                self._mark_failed(backend, e)
+
+    def _health_loop(self):
+        while True:
+            self.check_health()
+            time.sleep(self.health_interval)
+
+    def _ensure_health_checks(self):
+        if self._health_thread is None and len(self.backends) > 1:
+            with self._lock:
+                if self._health_thread is None:
+                    self._health_thread = threading.Thread(target=self._health_loop, name="llm-pool-health", daemon=True)
+                    self._health_thread.start()
+
+    def _mark_failed(self, backend: Backend, error):
+        with self._lock:
+            backend.healthy = False
+            backend.failures += 1
+            backend.last_error = str(error)
+
+    # ---- Routing
+    def _pick(self, model: Optional[str], exclude, prefer: Optional[str]) -> Backend:
+        candidates = [b for b in self.backends if b.url not in exclude and b.serves(model)]
+        healthy = [b for b in candidates if b.healthy]
+        # If every server looks down, try them anyway rather than failing outright
+        candidates = healthy or candidates
+        if not candidates:
+            raise NoBackendAvailable(f"No server available for model {model!r}")
+
+        least = min(b.outstanding for b in candidates)
+        for backend in candidates:
+            # Stay on the preferred server unless it is clearly busier than the others
+            if backend.url == prefer and backend.outstanding <= least + 1:
+                return backend
+        tied = [b for b in candidates if b.outstanding == least]
+        self._next += 1
+        return tied[self._next % len(tied)]
+
+    def _acquire(self, model, exclude, prefer) -> Backend:
+        with self._lock:
+            backend = self._pick(model, exclude, prefer)
+            backend.outstanding += 1
+            backend.requests += 1
+            return backend
+
+    def _release(self, backend: Backend):
+        with self._lock:
+            backend.outstanding -= 1
+
+    # Yields the server to use for one attempt; exclude lists servers that already failed
+    @contextmanager
+    def acquire(self, model: Optional[str] = None, exclude=(), prefer: Optional[str] = None) -> Iterator[Backend]:
+        self._ensure_health_checks()
+        backend = self._acquire(model, exclude, prefer)
+        try:
+            yield backend
+        finally:
+            self._release(backend)
+
+    # ---- Pooled keep-alive HTTP clients
+    def sync_client(self) -> httpx.Client:
+        if self._sync_client is None:
+            with self._lock:
+                if self._sync_client is None:
+                    self._sync_client = httpx.Client(timeout=REQUEST_TIMEOUT, limits=POOL_LIMITS)
+        return self._sync_client
+
+    def async_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(timeout=REQUEST_TIMEOUT, limits=POOL_LIMITS)
+            self._async_clients[loop] = client
+        return client
+
+    # ---- Requests with failover. A server is only abandoned before it has produced
+    # any output, so a failed stream is never replayed to the caller.
+    def post(self, path: str, payload: dict, model: Optional[str] = None, prefer: Optional[str] = None):
+        last_error = None
+        tried = []
+        for _ in range(len(self.backends)):
+            with self.acquire(model, exclude=tried, prefer=prefer) as backend:
+                try:
+                    response = self.sync_client().post(f"{backend.url}{path}", json=payload)
+                    if response.status_code >= 500:
+                        raise BackendError(f"{backend.url} returned {response.status_code}: {response.text[:200]}")
+                    response.raise_for_status()
+                    return backend, response.json()
+                except (httpx.TransportError, BackendError) as e:
+                    self._mark_failed(backend, e)
+                    tried.append(backend.url)
+                    last_error = e
+        raise NoBackendAvailable(f"All servers failed: {last_error}")
+
+    async def stream(self, path: str, payload: dict, model: Optional[str] = None, prefer: Optional[str] = None,
+                     on_backend=None):
+        last_error = None
+        tried = []
+        for _ in range(len(self.backends)):
+            started = False
+            with self.acquire(model, exclude=tried, prefer=prefer) as backend:
+                if on_backend is not None:
+                    on_backend(backend)
+                try:
+                    async with self.async_client().stream("POST", f"{backend.url}{path}", json=payload) as response:
+                        if response.status_code >= 500:
+                            await response.aread()
+                            raise BackendError(f"{backend.url} returned {response.status_code}: {response.text[:200]}")
+                        response.raise_for_status()
+                        async for line in response.aiter_lines():
+                            if not line:
+                                continue
+                            chunk = json.loads(line)
+                            if chunk.get("error"):
+                                raise RuntimeError(chunk["error"])
+                            started = True
+                            yield chunk
+                    return
+                except (httpx.TransportError, BackendError) as e:
+                    self._mark_failed(backend, e)
+                    if started:
+                        raise
+                    tried.append(backend.url)
+                    last_error = e
+        raise NoBackendAvailable(f"All servers failed: {last_error}")
+
+    def stats(self) -> List[dict]:
+        with self._lock:
+            return [
+                {"url": b.url, "healthy": b.healthy, "outstanding": b.outstanding,
+                 "requests": b.requests, "failures": b.failures, "last_error": b.last_error}
+                for b in self.backends
+            ]
+
+
+_default_pool: Optional[BackendPool] = None
+_default_lock = threading.Lock()
+
+
+# Process-wide pool built from OLLAMA_URLS
+def default_pool() -> BackendPool:
+    global _default_pool
+    with _default_lock:
+        if _default_pool is None:
+            _default_pool = BackendPool.from_env()
+        return _default_pool
+
+
+def _usage(final: dict) -> dict:
+    input_tokens, output_tokens = final.get("prompt_eval_count", 0), final.get("eval_count", 0)
+    return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+
+def _metadata(final: dict) -> dict:
+    return {key: value for key, value in final.items() if key not in ("message", "response", "context")}
+
+
+# ---- Chat model backed by a BackendPool, with the subset of the LangChain ChatOllama
+# interface both apps use: invoke(), ainvoke() and astream() on a prompt string.
+# options are Ollama generation options (temperature, num_ctx, num_predict, ...).
+class PooledChatOllama:
+    def __init__(self, model: str, pool: Optional[BackendPool] = None, **options):
+        self.model = model
+        self.pool = pool or default_pool()
+        self.top_level = {key: options.pop(key) for key in TOP_LEVEL_OPTIONS if key in options}
+        self.options = options
+
+    def _payload(self, prompt, stream: bool) -> dict:
+        content = prompt if isinstance(prompt, str) else str(prompt)
+        return {
+            "model": self.model,
+            "messages": [{"role": "user", "content": content}],
+            "stream": stream,
+            "options": self.options,
+            **self.top_level,
+        }
+
+    def invoke(self, prompt, *args, **kwargs) -> AIMessage:
+        _, final = self.pool.post("/api/chat", self._payload(prompt, stream=False), model=self.model)
+        if final.get("error"):
+            raise RuntimeError(final["error"])
+        return AIMessage(
+            content=final.get("message", {}).get("content", ""),
+            response_metadata=_metadata(final),
+            usage_metadata=_usage(final),
+        )
+
+    async def astream(self, prompt, *args, **kwargs):
+        async for chunk in self.pool.stream("/api/chat", self._payload(prompt, stream=True), model=self.model):
+            text = chunk.get("message", {}).get("content", "")
+            if chunk.get("done"):
+                yield AIMessageChunk(content=text, response_metadata=_metadata(chunk), usage_metadata=_usage(chunk))
+            elif text:
+                yield AIMessageChunk(content=text)
+
+    async def ainvoke(self, prompt, *args, **kwargs) -> AIMessage:
+        message = None
+        async for chunk in self.astream(prompt):
+            message = chunk if message is None else message + chunk
+        message = message or AIMessageChunk(content="")
+        return AIMessage(
+            content=message.content,
+            response_metadata=message.response_metadata,
+            usage_metadata=message.usage_metadata,
+        )